@@ -0,0 +1,109 @@
+"""
+Versão NumPy do "Full Auto" do ImageMagick, aplicada direto no buffer do QImage:
+
+    -auto-gamma  -contrast-stretch 0.1%x0.1%  -modulate 100,110
+
+Gamma e contrast-stretch são iguais para R, G e B (canais sincronizados,
+como no ImageMagick), então viram uma única tabela de 256 entradas.
+Só a saturação precisa de conta por pixel, feita em faixas de linhas para
+não alocar float32 da imagem inteira.
+"""
+import sys
+import numpy as np
+from PySide6.QtGui import QImage
+
+STRETCH_PERCENT = 0.1     # -contrast-stretch 0.1%x0.1%
+SATURATION = 1.10         # -modulate 100,110
+CHUNK_ROWS = 256          # Linhas por faixa (limita a memória temporária)
+
+# Formatos de 32 bits por pixel que dá para editar sem converter
+_BGRX_FORMATS = (QImage.Format_RGB32, QImage.Format_ARGB32)
+_RGBX_FORMATS = (QImage.Format_RGBX8888, QImage.Format_RGBA8888)
+
+def qimage_view(img):
+    """
+    Visão NumPy (altura, largura, 4) dos pixels do QImage, sem cópia.
+    Retorna (array, (iR, iG, iB)) com a posição de cada canal no pixel.
+    """
+    fmt = img.format()
+    if fmt in _BGRX_FORMATS:
+        # 0xAARRGGBB em inteiro nativo: em little-endian os bytes ficam B, G, R, A
+        order = (2, 1, 0) if sys.byteorder == "little" else (1, 2, 3)
+    elif fmt in _RGBX_FORMATS:
+        order = (0, 1, 2)
+    else:
+        raise ValueError(f"Formato de QImage não suportado: {fmt}")
+
+    h, w = img.height(), img.width()
+    buf = np.frombuffer(img.bits(), dtype=np.uint8)
+    rows = buf.reshape(h, img.bytesPerLine())
+    return rows[:, :w * 4].reshape(h, w, 4), order
+
+def _chunks(height):
+    for y in range(0, height, CHUNK_ROWS):
+        yield slice(y, min(y + CHUNK_ROWS, height))
+
+def _gamma_lut(view, order):
+    """-auto-gamma: gamma tal que a média de R, G e B vá para 50%."""
+    total = 0
+    count = 0
+    for rows in _chunks(view.shape[0]):
+        rgb = view[rows][..., list(order)]
+        total += int(rgb.sum(dtype=np.uint64))
+        count += rgb.size
+    mean = total / max(count, 1) / 255.0
+    if mean <= 0.0 or mean >= 1.0:
+        return np.arange(256, dtype=np.uint8)
+    gamma = np.log(mean) / np.log(0.5)
+    x = np.arange(256, dtype=np.float64) / 255.0
+    return np.clip(np.round(255.0 * x ** (1.0 / gamma)), 0, 255).astype(np.uint8)
+
+def _stretch_lut(view, order, gamma_lut, percent=STRETCH_PERCENT):
+    """
+    -contrast-stretch: pontos preto/branco pelo histograma da intensidade
+    (Rec. 601, já com o gamma aplicado), descartando 'percent'% em cada ponta.
+    """
+    iR, iG, iB = order
+    hist = np.zeros(256, dtype=np.int64)
+    for rows in _chunks(view.shape[0]):
+        chunk = gamma_lut[view[rows]]
+        luma = (0.299 * chunk[..., iR] + 0.587 * chunk[..., iG] + 0.114 * chunk[..., iB])
+        hist += np.bincount(np.round(luma).astype(np.uint8).ravel(), minlength=256)
+
+    threshold = hist.sum() * percent / 100.0
+    cumulative = np.cumsum(hist)
+    black = int(np.searchsorted(cumulative, threshold, side="right"))
+    cumulative_top = np.cumsum(hist[::-1])
+    white = 255 - int(np.searchsorted(cumulative_top, threshold, side="right"))
+    if white <= black:
+        return np.arange(256, dtype=np.uint8)
+
+    x = np.arange(256, dtype=np.float64)
+    return np.clip(np.round(255.0 * (x - black) / (white - black)), 0, 255).astype(np.uint8)
+
+def apply_full_auto(img, saturation=SATURATION):
+    """
+    Aplica a correção automática no próprio QImage (in-place quando o
+    formato é de 32 bits) e retorna o QImage corrigido.
+    """
+    if img.isNull():
+        return img
+    if img.format() not in _BGRX_FORMATS + _RGBX_FORMATS:
+        img = img.convertToFormat(QImage.Format_RGB32) # Única cópia, só em formatos raros
+
+    view, order = qimage_view(img)
+    channels = list(order)
+
+    gamma_lut = _gamma_lut(view, order)
+    lut = _stretch_lut(view, order, gamma_lut)[gamma_lut] # gamma e depois stretch
+
+    for rows in _chunks(view.shape[0]):
+        rgb = lut[view[rows][..., channels]].astype(np.float32)
+        if saturation != 1.0:
+            # Saturação em HSL: rgb' = L + (rgb - L) * k, com L = (max + min) / 2
+            light = (rgb.max(axis=-1, keepdims=True) + rgb.min(axis=-1, keepdims=True)) * 0.5
+            rgb = light + (rgb - light) * saturation
+            np.clip(rgb, 0, 255, out=rgb)
+            np.round(rgb, out=rgb)
+        view[rows, :, channels] = rgb.astype(np.uint8)
+    return img
@@ -0,0 +1,88 @@
+"""
+Confere o Full Auto em NumPy (auto_correct.py) contra o ImageMagick:
+para cada foto, roda os dois e compara pixel a pixel, além do tempo.
+
+Uso:
+    python benchmarks/compare_auto_correct.py PASTA [--limit 20] [--mean-tol 3] [--p99-tol 12]
+
+Sai com código 1 se alguma foto passar da tolerância.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtGui import QImage, QImageReader
+from auto_correct import apply_full_auto, qimage_view
+from export_manager import IS_WINDOWS
+
+def rgb_array(img):
+    view, order = qimage_view(img.convertToFormat(QImage.Format_RGB32))
+    return view[..., list(order)].astype(np.int16)
+
+def run_magick(executable, src, dst):
+    # Mesmo combo do export_manager._process_imagemagick (saída PNG: sem perda na comparação)
+    cmd = [executable, src, "-auto-orient", "-auto-gamma", "-contrast-stretch", "0.1%x0.1%",
+           "-modulate", "100,110", dst]
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folder")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--mean-tol", type=float, default=3.0, help="Erro médio máximo (níveis de 0-255)")
+    parser.add_argument("--p99-tol", type=float, default=12.0, help="Percentil 99 máximo do erro")
+    args = parser.parse_args()
+
+    executable = "magick" if IS_WINDOWS else "convert"
+    if shutil.which(executable) is None:
+        sys.exit(f"{executable} não encontrado: nada para comparar.")
+
+    names = sorted(n for n in os.listdir(args.folder) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    names = names[:args.limit]
+    tmp = tempfile.mkdtemp(prefix="auto_correct_")
+    failures = 0
+    t_numpy = t_magick = 0.0
+
+    try:
+        for name in names:
+            src = os.path.join(args.folder, name)
+            ref_path = os.path.join(tmp, os.path.splitext(name)[0] + ".png")
+            t_magick += run_magick(executable, src, ref_path)
+
+            reader = QImageReader(src)
+            reader.setAutoTransform(True)
+            img = reader.read()
+            start = time.perf_counter()
+            img = apply_full_auto(img)
+            t_numpy += time.perf_counter() - start
+
+            ref = QImage(ref_path)
+            if ref.size() != img.size():
+                print(f"{name}: tamanhos diferentes {img.size()} x {ref.size()}")
+                failures += 1
+                continue
+
+            diff = np.abs(rgb_array(img) - rgb_array(ref))
+            mean, p99 = float(diff.mean()), float(np.percentile(diff, 99))
+            ok = mean <= args.mean_tol and p99 <= args.p99_tol
+            failures += not ok
+            print(f"{'ok ' if ok else 'FALHOU'} {name}: erro médio {mean:.2f}, p99 {p99:.0f}, máx {int(diff.max())}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    n = max(len(names), 1)
+    print(f"\nNumPy {t_numpy / n * 1000:.0f} ms/foto | ImageMagick {t_magick / n * 1000:.0f} ms/foto "
+          f"(inclui abrir o processo e decodificar)")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compara os motores de exportação (Nativo x ImageMagick) numa pasta de fotos:
+arquivos/s, MB/s lidos e tamanho total gerado.
+
+Uso:
+    python benchmarks/export_engines.py PASTA [--resize 1920] [--quality 85] [--workers N]
+"""
+import os
+import sys
+import glob
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export_manager
+from folder_scanner import IMAGE_EXTENSIONS
+
+def run_engine(engine, paths, settings, workers):
+    dest = tempfile.mkdtemp(prefix=f"bench_{engine.lower()}_")
+    try:
+        scheduler = export_manager.ExportScheduler(dest, dict(settings, engine_name=engine), workers)
+        summary = scheduler.run(paths)
+        out_bytes = sum(os.path.getsize(p) for p in glob.glob(os.path.join(dest, "*")))
+        summary["out_mb"] = out_bytes / (1024 * 1024)
+        return summary
+    finally:
+        shutil.rmtree(dest, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folder")
+    parser.add_argument("--resize", type=int, default=1920)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--workers", type=int, default=export_manager.default_export_workers())
+    parser.add_argument("--engines", default="Nativo,ImageMagick")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.folder, name) for name in os.listdir(args.folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        sys.exit(f"Nenhuma imagem em {args.folder}")
+
+    settings = {
+        "use_resize": args.resize > 0,
+        "resize_value": args.resize,
+        "use_quality": True,
+        "quality_value": args.quality,
+    }
+    magick = "magick" if export_manager.IS_WINDOWS else "convert"
+
+    print(f"{len(paths)} arquivos | resize {args.resize}px | qualidade {args.quality} | {args.workers} em paralelo")
+    for engine in args.engines.split(","):
+        if engine == "ImageMagick" and shutil.which(magick) is None:
+            print(f"{engine:12s} pulado ({magick} não encontrado)")
+            continue
+        r = run_engine(engine, paths, settings, args.workers)
+        print(f"{engine:12s} {r['ok']:4d} ok {r['failed']:3d} falhas  {r['seconds']:7.2f}s  "
+              f"{r['files_per_sec']:7.1f} arq/s  {r['mb_per_sec']:7.1f} MB/s  saída {r['out_mb']:8.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Reproduz uma sessão de seleção gravada contra o CullingApp, sem janela, e mede
+a latência de cada passo: de update_position até o preview aparecer
+(update_preview_slot, ou direto do cache na troca de foto).
+
+Gravar (uso normal do programa):
+    PASSA_RECORD_SESSION=sessao.jsonl python culling.py
+
+Reproduzir:
+    python benchmarks/replay_session.py sessao.jsonl [--folder PASTA] [--speed 1.0]
+                                        [--warm] [--out resultado.json]
+
+O replay roda no modo de teste do QStandardPaths: notas e cache de disco ficam
+isolados dos reais e começam vazios (--warm mantém o cache de disco da
+execução anterior). As configurações (QSettings) são as do usuário.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.pop("PASSA_RECORD_SESSION", None) # O replay não grava a si mesmo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtCore import QTimer, QEventLoop, QStandardPaths
+from PySide6.QtWidgets import QApplication
+
+from session_recorder import load_session, key_event_from
+
+LOADING_TEXT = "Carregando..."
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def pump_until(app, done, deadline):
+    """Roda o loop de eventos até done() ou o instante 'deadline' (perf_counter)."""
+    while not done() and time.perf_counter() < deadline:
+        app.processEvents(QEventLoop.AllEvents | QEventLoop.WaitForMoreEvents)
+
+class StepProbe:
+    """
+    Intercepta o CullingApp por fora: cada update_position abre um passo,
+    o próximo setPixmap do preview fecha. Se outra tecla chegar antes,
+    o passo conta como abandonado (a pessoa passou sem ver a foto).
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.pending = None
+        self.latencies = []
+        self.abandoned = 0
+        self.loading_shown = 0
+
+        worker = window.image_worker
+        update_position = worker.update_position
+        def probed_update_position(index):
+            if self.pending is not None:
+                self.abandoned += 1
+            self.pending = time.perf_counter()
+            update_position(index)
+        worker.update_position = probed_update_position
+
+        frame = window.preview_frame
+        set_pixmap = frame.setPixmap
+        def probed_set_pixmap(pixmap):
+            set_pixmap(pixmap)
+            if self.pending is not None:
+                self.latencies.append((time.perf_counter() - self.pending) * 1000)
+                self.pending = None
+        frame.setPixmap = probed_set_pixmap
+
+        set_text = frame.setText
+        def probed_set_text(text):
+            if text == LOADING_TEXT and self.pending is not None:
+                self.loading_shown += 1
+            set_text(text)
+        frame.setText = probed_set_text
+
+def isolate_storage(warm):
+    """Modo de teste do Qt: notas e cache em pastas próprias, zeradas a cada replay."""
+    QStandardPaths.setTestModeEnabled(True)
+    data = QStandardPaths.writableLocation(QStandardPaths.GenericDataLocation)
+    shutil.rmtree(os.path.join(data, "LeonardoSoft", "SelecionadorFotos"), ignore_errors=True)
+    if not warm:
+        cache = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+        shutil.rmtree(os.path.join(cache, "LeonardoSoft", "SelecionadorFotos"), ignore_errors=True)
+
+def replay(app, window, events, folder_override, speed):
+    probe = StepProbe(window)
+    cache_tier = window.image_cache.previews
+    hits0, misses0 = cache_tier.hits, cache_tier.misses
+
+    base = time.perf_counter()
+    t_ref = events[0]["t"] if events else 0.0
+    keys = 0
+    for event in events:
+        pump_until(app, lambda: False, base + (event["t"] - t_ref) / speed)
+
+        if event["type"] == "folder":
+            if "window" in event:
+                window.resize(*event["window"])
+            window.load_images(folder_override or event["path"])
+            # A listagem depende do disco desta máquina: espera terminar e retoma a linha do tempo
+            pump_until(app, lambda: window.folder_scanner.isFinished(), time.perf_counter() + 120)
+            base, t_ref = time.perf_counter(), event["t"]
+        elif event["type"] == "key":
+            target = window.filmstrip if event["target"] == "filmstrip" else window.preview_frame
+            QApplication.sendEvent(target, key_event_from(event))
+            keys += 1
+
+    # Dá tempo para o último preview chegar
+    pump_until(app, lambda: probe.pending is None, time.perf_counter() + 5)
+
+    hits, misses = cache_tier.hits - hits0, cache_tier.misses - misses0
+    steps = probe.latencies
+    return {
+        "keys": keys,
+        "steps": len(steps) + probe.abandoned + (probe.pending is not None),
+        "shown": len(steps),
+        "abandoned": probe.abandoned,
+        "p50_ms": round(percentile(steps, 50), 2),
+        "p95_ms": round(percentile(steps, 95), 2),
+        "p99_ms": round(percentile(steps, 99), 2),
+        "max_ms": round(max(steps, default=0.0), 2),
+        "preview_cache_hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "loading_shown": probe.loading_shown,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("session")
+    parser.add_argument("--folder", help="Usa esta pasta no lugar da gravada (sessão de outra máquina)")
+    parser.add_argument("--speed", type=float, default=1.0, help="2.0 = reproduz no dobro da velocidade")
+    parser.add_argument("--warm", action="store_true", help="Mantém o cache de disco do replay anterior")
+    parser.add_argument("--out", help="Grava o resultado em JSON")
+    args = parser.parse_args()
+
+    header, events = load_session(args.session)
+    if not any(e["type"] == "folder" for e in events) and not args.folder:
+        sys.exit("A gravação não tem pasta aberta: informe --folder.")
+    if not any(e["type"] == "folder" for e in events):
+        events.insert(0, {"t": events[0]["t"] if events else 0.0, "type": "folder", "path": args.folder})
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    isolate_storage(args.warm)
+
+    import culling # Depois do modo de teste: o CullingApp abre notas/cache no __init__
+    window = culling.CullingApp()
+    window.xmp_sync = False # Nunca mexe nos sidecars de verdade durante o replay
+    window.show()
+
+    # Tique periódico: garante que o WaitForMoreEvents sempre acorde
+    ticker = QTimer()
+    ticker.start(5)
+
+    try:
+        result = replay(app, window, events, args.folder, args.speed)
+    finally:
+        window.close()
+
+    result["session"] = os.path.basename(args.session)
+    result["recorded"] = header.get("started")
+    print(f"{result['keys']} teclas, {result['steps']} trocas de foto "
+          f"({result['abandoned']} passaram antes do preview)")
+    print(f"update_position -> preview: p50 {result['p50_ms']:.1f} ms | p95 {result['p95_ms']:.1f} ms | "
+          f"p99 {result['p99_ms']:.1f} ms | máx {result['max_ms']:.1f} ms")
+    print(f"Cache de previews: {result['preview_cache_hit_rate']:.0%} de acerto")
+    print(f"\"{LOADING_TEXT}\" exibido {result['loading_shown']} vezes")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
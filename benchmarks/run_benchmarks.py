@@ -0,0 +1,407 @@
+"""
+Suíte de benchmarks dos caminhos quentes, sem janela (QT_QPA_PLATFORM=offscreen):
+carregamento de thumbnails/previews, filtro da fita e exportação por motor.
+
+Uso:
+    python benchmarks/run_benchmarks.py [--files 60] [--filter-items 1000,20000,50000]
+                                        [--out resultado.json] [--baseline base.json]
+                                        [--tolerance 0.20] [--save-baseline base.json]
+
+Gera um corpus sintético (JPEG, PNG e DNG com preview embutido) numa pasta
+temporária. Com --baseline, compara cada métrica e sai com código 1 se
+alguma piorar mais que a tolerância. A baseline é da máquina: gere a sua
+com --save-baseline antes da mudança e compare depois. A etapa de
+exportação também confere que nenhum motor altera o original (sai com
+código 1 se alterar).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import argparse
+import platform
+import tempfile
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PySide6 import __version__ as PYSIDE_VERSION
+from PySide6.QtCore import Qt, QTimer, QEventLoop, QBuffer, QIODevice
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication, QListView
+
+import export_manager
+from disk_cache import DiskCache
+from image_cache import CacheTier, ImageCache
+from image_loader import ImageLoaderWorker, default_worker_count
+from filmstrip_model import FilmstripModel, FilmstripDelegate, RatingFilterProxyModel
+from selector import ImageSelector
+
+# Tamanhos do corpus: próximos do que chega de câmera, sem deixar a geração lenta
+JPEG_SIZE = (2400, 1600)
+PNG_SIZE = (1200, 800)
+DNG_PREVIEW_SIZE = (1600, 1066)
+DNG_THUMB_SIZE = (160, 106)
+
+# --- CORPUS ---
+
+def synthetic_image(width, height, seed):
+    """Gradiente + ruído: comprime como foto (nem liso demais, nem só ruído)."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[..., 0] = (x * 255 // max(width - 1, 1)) & 0xFF
+    pixels[..., 1] = (y * 255 // max(height - 1, 1)) & 0xFF
+    pixels[..., 2] = ((x + y + seed * 37) % 256)
+    pixels[..., :3] = np.clip(pixels[..., :3] + rng.integers(-24, 24, (height, width, 3)), 0, 255)
+    pixels[..., 3] = 255
+    img = QImage(pixels.data, width, height, width * 4, QImage.Format_RGB32)
+    return img.copy() # Desgruda do buffer NumPy
+
+def jpeg_bytes(img, quality=90):
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    img.save(buffer, "JPG", quality)
+    return bytes(buffer.data())
+
+def write_dng(path, preview, thumb):
+    """
+    DNG mínimo no formato que as câmeras gravam: IFD0 com a thumbnail EXIF
+    (JPEGInterchangeFormat) e um IFD encadeado com o preview grande em strip
+    JPEG. É o que o exif_reader/loader procuram; não há dados RAW de sensor.
+    """
+    thumb_data, preview_data = jpeg_bytes(thumb), jpeg_bytes(preview)
+
+    def ifd(entries, next_offset):
+        out = struct.pack("<H", len(entries))
+        for tag, typ, count, value in sorted(entries):
+            out += struct.pack("<HHII", tag, typ, count, value)
+        return out + struct.pack("<I", next_offset)
+
+    ifd0_size = 2 + 12 * 6 + 4
+    ifd1_size = 2 + 12 * 6 + 4
+    ifd0_pos = 8
+    ifd1_pos = ifd0_pos + ifd0_size
+    thumb_pos = ifd1_pos + ifd1_size
+    preview_pos = thumb_pos + len(thumb_data)
+
+    ifd0 = ifd([
+        (0x00FE, 4, 1, 1),                                   # NewSubfileType: reduzida
+        (0x0100, 4, 1, thumb.width()), (0x0101, 4, 1, thumb.height()),
+        (0x0201, 4, 1, thumb_pos), (0x0202, 4, 1, len(thumb_data)),
+        (0xC612, 1, 4, 0x00000401),                          # DNGVersion 1.4.0.0
+    ], ifd1_pos)
+    ifd1 = ifd([
+        (0x00FE, 4, 1, 1),
+        (0x0100, 4, 1, preview.width()), (0x0101, 4, 1, preview.height()),
+        (0x0103, 3, 1, 7),                                   # Compression: JPEG
+        (0x0111, 4, 1, preview_pos), (0x0117, 4, 1, len(preview_data)),
+    ], 0)
+    with open(path, "wb") as f:
+        f.write(b"II*\x00" + struct.pack("<I", ifd0_pos) + ifd0 + ifd1 + thumb_data + preview_data)
+
+def make_corpus(folder, count):
+    """Um terço de cada: JPEG, PNG e DNG. Retorna os caminhos em ordem."""
+    paths = []
+    for i in range(count):
+        kind = ("jpg", "png", "dng")[i % 3]
+        path = os.path.join(folder, f"bench_{i:04d}.{kind}")
+        if kind == "jpg":
+            synthetic_image(*JPEG_SIZE, seed=i).save(path, "JPG", 90)
+        elif kind == "png":
+            synthetic_image(*PNG_SIZE, seed=i).save(path, "PNG")
+        else:
+            write_dng(path, synthetic_image(*DNG_PREVIEW_SIZE, seed=i), synthetic_image(*DNG_THUMB_SIZE, seed=i))
+        paths.append(path)
+    return paths
+
+# --- MEDIÇÃO ---
+
+def wait_for(app, done, timeout=60.0):
+    """Roda o loop de eventos até done() ou o timeout (sinais entre threads chegam por aqui)."""
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            return False
+        app.processEvents(QEventLoop.AllEvents | QEventLoop.WaitForMoreEvents)
+    return True
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def new_loader(tmp, name, workers):
+    loader = ImageLoaderWorker(workers, 3, ImageCache(512))
+    loader.disk_cache = DiskCache(os.path.join(tmp, name)) # Cache de disco isolado (frio)
+    return loader
+
+def bench_loader(app, paths, tmp, workers):
+    stats = {path: os.stat(path) for path in paths}
+    metrics = {}
+
+    # 1. Thumbnails: todas pedidas de uma vez, como a fita faz ao abrir a pasta
+    loader = new_loader(tmp, "thumbs", workers)
+    start = time.perf_counter()
+    loader.set_paths(paths, stats)
+    loader.start()
+    for path in paths:
+        loader.request_thumbnail(path)
+    ok = wait_for(app, lambda: all(p in loader.cache.thumbnails or p in loader.failed_thumbs for p in paths))
+    elapsed = time.perf_counter() - start
+    loaded = sum(p in loader.cache.thumbnails for p in paths)
+    loader.stop()
+    metrics["loader.thumbnails_per_sec"] = (loaded / elapsed if ok else 0.0, "arq/s", "higher")
+
+    # 2. Previews: tempo até o primeiro e depois foto a foto, como quem segura a seta
+    loader = new_loader(tmp, "previews", workers)
+    delivered = set()
+    loader.signals.preview_loaded.connect(lambda path, _: delivered.add(path))
+    start = time.perf_counter()
+    loader.set_paths(paths, stats)
+    loader.start()
+    loader.update_position(0)
+    wait_for(app, lambda: paths[0] in delivered)
+    metrics["loader.time_to_first_preview_ms"] = ((time.perf_counter() - start) * 1000, "ms", "lower")
+
+    steps = []
+    for index, path in enumerate(paths[1:], start=1):
+        step_start = time.perf_counter()
+        loader.update_position(index)
+        wait_for(app, lambda: path in delivered or loader.cache.previews.peek(path) is not None)
+        steps.append((time.perf_counter() - step_start) * 1000)
+    loader.stop()
+    total = sum(steps) / 1000
+    metrics["loader.previews_per_sec"] = ((len(steps) / total) if total else 0.0, "arq/s", "higher")
+    metrics["loader.preview_step_p50_ms"] = (percentile(steps, 50), "ms", "lower")
+    metrics["loader.preview_step_p95_ms"] = (percentile(steps, 95), "ms", "lower")
+    return metrics
+
+def bench_filters(app, sizes, repeats=20):
+    """
+    Custo do filtro da fita (o que o CullingApp.apply_filters faz) com N fotos:
+    ligar/desligar o filtro e dar nota numa foto com o filtro ligado.
+    """
+    metrics = {}
+    for n in sizes:
+        selector = ImageSelector()
+        model = FilmstripModel(CacheTier("bench", 1), selector)
+        proxy = RatingFilterProxyModel(selector)
+        proxy.setSourceModel(model)
+        view = QListView()
+        view.setModel(proxy)
+        view.setItemDelegate(FilmstripDelegate(selector, view))
+        view.setFlow(QListView.LeftToRight)
+        view.setWrapping(False)
+        view.setUniformItemSizes(True)
+        view.resize(1000, 170)
+        view.show()
+
+        paths = [f"/bench/foto_{i:06d}.jpg" for i in range(n)]
+        model.set_paths(paths)
+        for i in range(0, n, 7): # ~14% com nota, espalhadas entre 1 e 5
+            selector.set_rating(paths[i], 1 + (i // 7) % 5)
+        app.processEvents()
+
+        toggles, ratings = [], []
+        for r in range(repeats):
+            start = time.perf_counter()
+            proxy.set_filters({5})
+            app.processEvents()
+            proxy.set_filters(set())
+            app.processEvents()
+            toggles.append((time.perf_counter() - start) * 1000 / 2)
+
+            proxy.set_filters({5})
+            path = paths[(r * 7919) % n]
+            start = time.perf_counter()
+            selector.set_rating(path, 0 if selector.get_rating(path) == 5 else 5)
+            model.refresh_path(path)
+            app.processEvents()
+            ratings.append((time.perf_counter() - start) * 1000)
+            proxy.set_filters(set())
+
+        view.close()
+        metrics[f"filter.toggle_ms.n{n}"] = (statistics.median(toggles), "ms", "lower")
+        metrics[f"filter.rate_with_filter_ms.n{n}"] = (statistics.median(ratings), "ms", "lower")
+    return metrics
+
+def bench_export(paths, tmp):
+    """Arquivos/s de export_manager.export_file, um por vez, para cada motor disponível."""
+    magick = "magick" if export_manager.IS_WINDOWS else "convert"
+    has_magick = shutil.which(magick) is not None
+    engines = {
+        "copia": {"engine_name": "[ Sem edição ]"},
+        "nativo": {"engine_name": "Nativo", "use_resize": True, "resize_value": 1200,
+                   "use_quality": True, "quality_value": 85},
+        "nativo_full_auto": {"engine_name": "Nativo", "use_resize": True, "resize_value": 1200,
+                             "use_quality": True, "quality_value": 85, "full_auto": True},
+        "imagemagick": {"engine_name": "ImageMagick", "use_resize": True, "resize_value": 1200,
+                        "use_quality": True, "quality_value": 85},
+    }
+    metrics = {}
+    for name, settings in engines.items():
+        todo = [p for p in paths if has_magick or not export_manager.uses_imagemagick(p, settings)]
+        if not todo:
+            print(f"export {name}: pulado ({magick} não encontrado)")
+            continue
+        dest = tempfile.mkdtemp(prefix=f"export_{name}_", dir=tmp)
+        start = time.perf_counter()
+        ok = sum(bool(export_manager.export_file(p, dest, settings)) for p in todo)
+        elapsed = time.perf_counter() - start
+        shutil.rmtree(dest, ignore_errors=True)
+        metrics[f"export.{name}_files_per_sec"] = (ok / elapsed if elapsed else 0.0, "arq/s", "higher")
+        if ok < len(todo):
+            print(f"export {name}: {len(todo) - ok} falhas")
+    return metrics
+
+def check_export_safety(paths, tmp):
+    """
+    Regressão de perda de dados: nenhuma exportação pode alterar o original.
+    Casos: reexportar por cima de uma saída que é hardlink do original, e
+    exportar para a própria pasta de origem. Retorna a lista de falhas.
+    """
+    magick = "magick" if export_manager.IS_WINDOWS else "convert"
+    engines = {
+        "copia": {"engine_name": "[ Sem edição ]"},
+        "nativo": {"engine_name": "Nativo", "use_resize": True, "resize_value": 600},
+    }
+    if shutil.which(magick):
+        engines["imagemagick"] = {"engine_name": "ImageMagick", "use_resize": True, "resize_value": 600}
+
+    folder = os.path.join(tmp, "safety")
+    dest = os.path.join(tmp, "safety_out")
+    os.makedirs(folder)
+    os.makedirs(dest)
+    src = shutil.copy2(next(p for p in paths if p.lower().endswith(".jpg")), folder)
+    with open(src, "rb") as f:
+        original = f.read()
+
+    problems = []
+    def check_intact(label):
+        with open(src, "rb") as f:
+            if f.read() == original:
+                return
+        problems.append(f"{label}: original alterado")
+        with open(src, "wb") as f:
+            f.write(original)
+
+    for name, settings in engines.items():
+        # Saída anterior é hardlink do original; a nova exportação grava por cima
+        export_manager.export_file(src, dest, {"use_hardlink": True})
+        export_manager.export_file(src, dest, settings)
+        check_intact(f"{name} sobre hardlink")
+
+        # Destino = pasta de origem: tem que recusar
+        if export_manager.export_file(src, folder, settings):
+            problems.append(f"{name} na pasta de origem: não recusou")
+        check_intact(f"{name} na pasta de origem")
+
+    leftovers = [n for n in os.listdir(dest) + os.listdir(folder) if n.endswith(export_manager.TEMP_SUFFIX)]
+    if leftovers:
+        problems.append(f"arquivos provisórios esquecidos: {', '.join(leftovers)}")
+    return problems
+
+# --- RESULTADO E BASELINE ---
+
+def compare(results, baseline, tolerance):
+    """Lista de (métrica, atual, baseline, variação) que pioraram além da tolerância."""
+    regressions = []
+    for name, current in results["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if not base or not base["value"]:
+            continue
+        change = (current["value"] - base["value"]) / base["value"]
+        worse = change > tolerance if current["better"] == "lower" else change < -tolerance
+        flag = "PIOROU" if worse else ("melhorou" if abs(change) > tolerance else "")
+        print(f"  {name:42s} {base['value']:10.2f} -> {current['value']:10.2f} {current['unit']:5s} "
+              f"{change:+7.1%} {flag}")
+        if worse:
+            regressions.append((name, current["value"], base["value"], change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=60, help="Tamanho do corpus gerado")
+    parser.add_argument("--filter-items", default="1000,20000,50000")
+    parser.add_argument("--workers", type=int, default=default_worker_count())
+    parser.add_argument("--out", help="Grava o resultado em JSON")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--save-baseline", help="Grava este resultado como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="Piora aceita (0.20 = 20%%)")
+    parser.add_argument("--skip", default="", help="Etapas a pular: loader,filter,export")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    # Tique periódico: garante que o WaitForMoreEvents do wait_for sempre acorde
+    ticker = QTimer()
+    ticker.start(20)
+
+    skip = set(filter(None, args.skip.split(",")))
+    tmp = tempfile.mkdtemp(prefix="passa_bench_")
+    metrics = {}
+    safety_problems = []
+    try:
+        corpus = os.path.join(tmp, "corpus")
+        os.makedirs(corpus)
+        start = time.perf_counter()
+        paths = make_corpus(corpus, args.files)
+        print(f"Corpus: {len(paths)} arquivos em {time.perf_counter() - start:.1f}s")
+
+        if "loader" not in skip:
+            metrics.update(bench_loader(app, paths, tmp, args.workers))
+        if "filter" not in skip:
+            metrics.update(bench_filters(app, [int(n) for n in args.filter_items.split(",") if n]))
+        if "export" not in skip:
+            metrics.update(bench_export(paths, tmp))
+            safety_problems = check_export_safety(paths, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "pyside": PYSIDE_VERSION,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "files": args.files,
+            "workers": args.workers,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "metrics": {
+            name: {"value": round(value, 3), "unit": unit, "better": better}
+            for name, (value, unit, better) in metrics.items()
+        },
+    }
+
+    for name, m in results["metrics"].items():
+        print(f"{name:42s} {m['value']:10.2f} {m['unit']}")
+
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if safety_problems:
+        print("\nExportação alterou ou sobrescreveu o original:")
+        for problem in safety_problems:
+            print(f"  {problem}")
+        sys.exit(1)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nComparando com {args.baseline} (tolerância {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} métrica(s) pioraram.")
+            sys.exit(1)
+        print("\nSem regressões.")
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,21 @@ import export_manager
 import datetime
 from image_viewer import ZoomablePreview
 from selector import ImageSelector
-from collections import OrderedDict
-from image_loader import ImageLoaderWorker
+from ratings_store import RatingsStore
+from xmp_ratings import XmpImporter, XmpSidecarWriter
+from session_recorder import SessionRecorder
+from image_cache import ImageCache
+from image_loader import ImageLoaderWorker, default_worker_count
+from folder_scanner import FolderScanner
+from filmstrip_model import FilmstripModel, FilmstripDelegate, RatingFilterProxyModel, PATH_ROLE
 from settings_dialog import SettingsDialog
-from PySide6.QtWidgets import (QApplication, QMainWindow, QListWidget, QListWidgetItem, 
+from tracing import tracer, span, trace_path_from_env
+from PySide6.QtWidgets import (QApplication, QMainWindow, QListView, 
                                QVBoxLayout, QWidget, QLabel, QPushButton, QFileDialog, 
                                QHBoxLayout, QProgressBar, QMessageBox, QLineEdit, QFrame, 
                                QAbstractItemView, QTextEdit)
-from PySide6.QtGui import QIcon, QPixmap, QImageReader, QColor, QPainter, QBrush, QFont
-from PySide6.QtCore import QSize, Qt, QThread, Signal, QRect, QEvent, QSettings
+from PySide6.QtGui import QIcon, QPixmap, QImageReader, QColor
+from PySide6.QtCore import QSize, Qt, QThread, Signal, QRect, QEvent, QSettings, QTimer, QStandardPaths
 
 # Silencia os avisos de metadados do Qt (Logs Fofoqueiros)
 os.environ["QT_LOGGING_RULES"] = "qt.imageformats.tiff.warning=false"
@@ -33,44 +39,22 @@ def calcular_tamanho_proporcional(size_original, max_w, max_h):
     ratio = min(max_w / w, max_h / h)
     return QSize(int(w * ratio), int(h * ratio))
 
-def desenhar_overlay_rating(pixmap, rating):
-    """Desenha o selo. Se rating for 0, retorna a imagem limpa."""
-    if rating == 0:
-        return pixmap
-    
-    resultado = pixmap.copy()
-    painter = QPainter(resultado)
-    painter.setRenderHint(QPainter.Antialiasing)
-
-    tamanho_selo = 30
-    margem = 5
-    # Posiciona no canto superior direito
-    x = resultado.width() - tamanho_selo - margem
-    y = margem
-
-    # Círculo Amarelo
-    painter.setBrush(QBrush(QColor("#f1c40f")))
-    painter.setPen(Qt.NoPen)
-    painter.drawEllipse(x, y, tamanho_selo, tamanho_selo)
-
-    # Número
-    painter.setPen(QColor("#000000"))
-    font = QFont("Arial", 12, QFont.Bold)
-    painter.setFont(font)
-    painter.drawText(QRect(x, y, tamanho_selo, tamanho_selo), Qt.AlignCenter, str(rating))
-
-    painter.end()
-    return resultado
-
 class CopyWorker(QThread):
     progress_signal = Signal(str) # Envia texto para o log (ex: "Copiando 1/100")
     finished_signal = Signal(int) # Envia total copiado ao terminar
 
-    def __init__(self, items, dest_folder, settings):
+    def __init__(self, items, dest_folder, settings, decoded=None):
         super().__init__()
         self.items = items # Dicionário {caminho: nota}
         self.dest_folder = dest_folder
         self.settings = settings
+        # Vários arquivos ao mesmo tempo (quantidade definida nas configurações)
+        self.scheduler = export_manager.ExportScheduler(
+            dest_folder, settings, settings.get("export_workers"), decoded)
+
+    def cancel(self):
+        """Pede a parada: a fila é descartada e os processos em andamento encerrados."""
+        self.scheduler.cancel()
 
     def run(self):
         total = len(self.items)
@@ -79,20 +63,33 @@ class CopyWorker(QThread):
             if not os.path.exists(self.dest_folder):
                 os.makedirs(self.dest_folder)
 
-            for i, (path, rating) in enumerate(self.items.items(), 1):
-                # --- ALTERAÇÃO AQUI ---
-                # Em vez de shutil.copy2, chamamos o gerente
-                success = export_manager.export_file(path, self.dest_folder, self.settings)
-                
+            def on_result(path, success, done, total):
+                nonlocal count
+                filename = os.path.basename(path)
                 if success:
                     count += 1
-                    filename = os.path.basename(path)
                     self.progress_signal.emit(f"Processado: {count}/{total} - {filename}")
                 else:
-                    self.progress_signal.emit(f"FALHA: {os.path.basename(path)}")
-                # ----------------------
-            
-            self.finished_signal.emit(count)
+                    self.progress_signal.emit(f"FALHA: {filename}")
+
+            # Diário da pasta de destino: só processa o que mudou ou falta
+            pending, up_to_date = self.scheduler.plan(list(self.items.keys()))
+            if up_to_date:
+                self.progress_signal.emit(f"⏭️ {len(up_to_date)} já exportados e em dia, pulando.")
+            total = len(pending)
+
+            summary = self.scheduler.run(pending, on_result)
+
+            if summary["from_memory"]:
+                self.progress_signal.emit(f"🧠 {summary['from_memory']} codificados direto da memória (sem reler o original).")
+            if summary["cancelled"]:
+                self.progress_signal.emit(f"⛔ Exportação cancelada ({summary['ok']}/{total}).")
+            self.progress_signal.emit(
+                f"⏱️ {summary['ok']} arquivos em {summary['seconds']:.1f}s "
+                f"({summary['files_per_sec']:.1f} arq/s, {summary['mb_per_sec']:.1f} MB/s, "
+                f"{self.scheduler.workers} em paralelo)"
+            )
+            self.finished_signal.emit(summary["ok"] + len(up_to_date))
             
         except Exception as e:
             self.progress_signal.emit(f"ERRO CRÍTICO: {str(e)}")
@@ -110,11 +107,24 @@ class CullingApp(QMainWindow):
         self.current_source_folder = ""
         self.current_dest_base = ""
         self.image_files = []
-        self.selector = ImageSelector()
-        self.thumbnails_cache = OrderedDict() # Guarda a imagem LIMPA original (LRU)
-        self.cache_limit = 200 # Limite de imagens em memória RAM
-        self.previews_cache = OrderedDict() # Cache para imagens grandes (720px)
-        self.preview_cache_limit = 20       # Limite seguro de 40MB
+        self.file_stats = {} # {caminho: os.stat_result} obtidos na listagem da pasta
+        self.folder_scanner = None
+        # Notas persistentes (SQLite), gravadas fora da thread da interface
+        self.ratings_store = RatingsStore()
+        self.ratings_store.start()
+        self.selector = ImageSelector(self.ratings_store)
+        # Notas XMP: leitura em lote ao abrir a pasta e gravação opcional nos sidecars
+        self.xmp_importer = None
+        self.xmp_writer = XmpSidecarWriter()
+        self.xmp_writer.start()
+        # Gravação da sessão para replay (só com PASSA_RECORD_SESSION definida)
+        self.session_recorder = SessionRecorder.from_env()
+        # Cache de RAM único (limitado em MB), compartilhado com o ImageLoaderWorker
+        qs = QSettings("LeonardoSoft", "SelecionadorFotos")
+        self.image_cache = ImageCache(qs.value("cache_budget_mb", 512, type=int))
+        self.xmp_sync = qs.value("xmp_sync", False, type=bool)
+        self.thumbnails_cache = self.image_cache.thumbnails # Guarda a imagem LIMPA original (LRU)
+        self.previews_cache = self.image_cache.previews     # Imagens grandes (até 1920px)
 
         # --- LAYOUT PRINCIPAL ---
         central_widget = QWidget()
@@ -130,7 +140,7 @@ class CullingApp(QMainWindow):
         top_layout.setContentsMargins(0, 0, 0, 0)
 
         # 1.1 Preview (Esquerda)
-        self.preview_frame = ZoomablePreview()
+        self.preview_frame = ZoomablePreview(tile_cache=self.image_cache.tiles)
         self.preview_frame.setStyleSheet("background-color: #000; border: 1px solid #333;")
         
         self.preview_frame.setMinimumSize(500, 400)
@@ -264,19 +274,24 @@ class CullingApp(QMainWindow):
         top_layout.addWidget(controls_panel)
 
         # === 2. BLOCO DE BAIXO (Fita de Fotos) - CORRIGIDO LAYOUT ===
-        self.filmstrip = QListWidget()
-        self.filmstrip.setViewMode(QListWidget.IconMode)
-        self.filmstrip.setFlow(QListWidget.LeftToRight) # Fluxo Horizontal
+        # Fita virtualizada: uma linha por arquivo desde o início, pixels puxados do cache
+        self.filmstrip_model = FilmstripModel(self.thumbnails_cache, self.selector, self)
+        # Filtro de notas por cima do modelo (só as linhas que mudam de nota são tocadas)
+        self.filter_proxy = RatingFilterProxyModel(self.selector, self)
+        self.filter_proxy.setSourceModel(self.filmstrip_model)
+        self.filmstrip = QListView()
+        self.filmstrip.setModel(self.filter_proxy)
+        self.filmstrip.setItemDelegate(FilmstripDelegate(self.selector, self.filmstrip))
+        self.filmstrip.setFlow(QListView.LeftToRight) # Fluxo Horizontal
         self.filmstrip.setWrapping(False) # <--- O SEGREDO: NÃO QUEBRAR LINHA
+        self.filmstrip.setUniformItemSizes(True) # Layout O(1), não mede item por item
         self.filmstrip.setFixedHeight(170)
-        self.filmstrip.setIconSize(QSize(130, 130))
+        self.filmstrip.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.filmstrip.setSpacing(10)
-        self.filmstrip.setResizeMode(QListWidget.Adjust)
+        self.filmstrip.setResizeMode(QListView.Adjust)
         self.filmstrip.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel) # Scroll suave
         self.filmstrip.setStyleSheet("""
-            QListWidget { background-color: #2c2c2c; border-top: 2px solid #444; }
-            QListWidget::item { color: #eee; }
-            QListWidget::item:selected { background-color: #2980b9; border-radius: 5px; border: 2px solid #3498db;}
+            QListView { background-color: #2c2c2c; border-top: 2px solid #444; }
         """)
         self.filmstrip.installEventFilter(self)
         self.preview_frame.installEventFilter(self)
@@ -296,25 +311,51 @@ class CullingApp(QMainWindow):
         self.btn_source.clicked.connect(self.select_source_folder)
         self.btn_dest_base.clicked.connect(self.select_dest_base)
         self.btn_export.clicked.connect(self.export_files)
-        self.filmstrip.currentItemChanged.connect(self.on_selection_changed)
+        self.filmstrip.selectionModel().currentChanged.connect(self.on_selection_changed)
         self.preview_frame.signals.max_size_changed.connect(self.handle_preview_resize)
 
-        # Configuração do Novo Worker
-        self.image_worker = ImageLoaderWorker()
+        # Configuração do Novo Worker (pool de N threads de decodificação)
+        decode_workers = qs.value("decode_workers", default_worker_count(), type=int)
+        prefetch_ahead = qs.value("prefetch_ahead", 3, type=int)
+        self.image_worker = ImageLoaderWorker(decode_workers, prefetch_ahead, self.image_cache)
         self.image_worker.signals.thumbnail_loaded.connect(self.add_thumbnail)
         self.image_worker.signals.preview_loaded.connect(self.update_preview_slot)
+        self.image_worker.signals.full_resolution_loaded.connect(self.on_full_resolution_loaded)
+        self.filmstrip_model.thumbnail_requested.connect(self.image_worker.request_thumbnail)
         self.image_worker.start()
 
+        # Medição por etapa (PASSA_TRACE ou Configurações): médias no log a cada 5s
+        self.trace_timer = QTimer(self)
+        self.trace_timer.setInterval(5000)
+        self.trace_timer.timeout.connect(self.log_trace_averages)
+        self.configure_tracing(qs.value("trace_enabled", False, type=bool))
+
     def closeEvent(self, event):
         """Garante que a Thread morra ao fechar a janela."""
         try:
             # Pára o worker de imagens
+            if self.folder_scanner is not None:
+                self.folder_scanner.cancel()
+                self.folder_scanner.wait()
+            if self.xmp_importer is not None:
+                self.xmp_importer.cancel()
+                self.xmp_importer.wait()
+
             if hasattr(self, "image_worker") and self.image_worker.isRunning():
                 self.image_worker.stop()
+
+            # Notas ainda na fila vão para o disco antes de sair
+            self.selector.close()
+            self.xmp_writer.close()
+            if self.session_recorder is not None:
+                self.session_recorder.close()
+            if tracer.enabled:
+                self.save_trace()
             
-            # Pára o worker de cópia se estiver rodando (opcional, mas seguro)
+            # Pára o worker de cópia se estiver rodando (cancelamento limpo, sem terminate)
             if hasattr(self, "copy_thread") and self.copy_thread.isRunning():
-                self.copy_thread.terminate() # Força parada pois cópia é bloqueante
+                self.copy_thread.cancel()
+                self.copy_thread.wait()
         except Exception as e:
             print(f"Erro ao fechar: {e}")
             
@@ -362,6 +403,37 @@ class CullingApp(QMainWindow):
         # 3. Log
         self.log(f"🖼️ Preview adaptativo: Máx {final_size}x{final_size}px")
 
+    def configure_tracing(self, enabled_in_settings):
+        """Liga/desliga a medição por etapa. A variável PASSA_TRACE sempre liga."""
+        path = trace_path_from_env()
+        if path is None and not enabled_in_settings:
+            if tracer.enabled:
+                self.save_trace()
+                tracer.disable()
+            self.trace_timer.stop()
+            return
+        if not tracer.enabled:
+            if not path:
+                base = QStandardPaths.writableLocation(QStandardPaths.GenericDataLocation)
+                name = datetime.datetime.now().strftime("trace_%Y%m%d_%H%M%S.json")
+                path = os.path.join(base, "LeonardoSoft", "SelecionadorFotos", "traces", name)
+            tracer.enable(path)
+            self.log(f"⏱️ Medição por etapa ligada (trace em {path})")
+        self.trace_timer.start()
+
+    def log_trace_averages(self):
+        # Só loga se algo foi medido desde a última vez (parado = silêncio)
+        if tracer.take_new_count():
+            self.log(f"⏱️ {tracer.summary_text()}")
+
+    def save_trace(self):
+        try:
+            path = tracer.dump()
+            if path:
+                print(f"Trace gravado em {path}")
+        except OSError as e:
+            print(f"Erro ao gravar o trace: {e}")
+
     def log(self, text):
         """Adiciona mensagem na caixa de log com scroll automático."""
         self.log_box.append(text)
@@ -383,7 +455,9 @@ class CullingApp(QMainWindow):
         for path in file_paths:
             try:
                 # Usamos o 'Modified Time' (mtime), que é o mais comum e confiável em todos os SOs.
-                mtime = os.path.getmtime(path)
+                # Reaproveita o stat da listagem da pasta quando existir
+                st = self.file_stats.get(path)
+                mtime = st.st_mtime if st else os.path.getmtime(path)
                 min_timestamp = min(min_timestamp, mtime)
                 max_timestamp = max(max_timestamp, mtime)
             except Exception:
@@ -427,102 +501,172 @@ class CullingApp(QMainWindow):
             self.log(f"📁 Destino base definido: {folder}")
 
     def load_images(self, folder):
-        self.filmstrip.clear()
-        self.selector.clear()
+        if self.image_files:
+            self.log(f"📊 Cache: {self.image_cache.stats_text()}")
+
+        if self.session_recorder is not None:
+            self.session_recorder.record_folder(folder, self.size())
+
+        self.filmstrip_model.set_paths([])
+        self.selector.load_folder(folder) # Notas salvas de sessões anteriores
         self.thumbnails_cache.clear()
         self.preview_frame.clear()
         self.preview_frame.setText("Carregando...")
 
-        extensoes = ('.jpg', '.jpeg', '.png', '.arw', '.cr2', '.nef', '.dng', '.bmp')
-        self.image_files = [
-            os.path.join(folder, f) for f in os.listdir(folder) 
-            if f.lower().endswith(extensoes)
-        ]
+        # Cancela a listagem anterior, se ainda estiver rodando
+        if self.folder_scanner is not None:
+            self.folder_scanner.cancel()
+            self.folder_scanner.batch_found.disconnect()
+            self.folder_scanner.scan_finished.disconnect()
+            self.folder_scanner.wait() # Cancelado, termina no próximo arquivo
+        self.cancel_xmp_import()
+
+        self.image_files = []
+        self.file_stats = {}
+        self.image_worker.set_paths([], {})
+
+        # Listagem em segundo plano: os lotes vão direto para o Buffer Inteligente
+        self.folder_scanner = FolderScanner(folder)
+        self.folder_scanner.batch_found.connect(self.on_scan_batch)
+        self.folder_scanner.scan_finished.connect(self.on_scan_finished)
+        self.folder_scanner.start()
+
+        # Barra de progresso "ocupada" enquanto lista
+        self.progress.setRange(0, 0)
+        self.progress.setVisible(True)
+        self.lbl_status.setText("Listando fotos...")
+        self.filmstrip.setFocus()
+
+    def on_scan_batch(self, batch):
+        """Recebe um lote do FolderScanner e já manda o worker começar."""
+        # Lotes de uma listagem cancelada ainda podem estar na fila de eventos
+        if self.sender() is not self.folder_scanner:
+            return
+        paths = [path for path, _ in batch]
+        stats = dict(batch)
+        self.image_files.extend(paths)
+        self.file_stats.update(stats)
+        self.filmstrip_model.append_paths(paths)
+        self.image_worker.append_paths(paths, stats)
+        self.lbl_status.setText(f"{len(self.image_files)} fotos encontradas...")
+
+    def on_scan_finished(self, total):
+        if self.sender() is not self.folder_scanner:
+            return
+        # Os lotes chegam em ordem do sistema de arquivos; no final ordenamos tudo
+        # mantendo as thumbnails já carregadas e a foto selecionada
+        current_path = self.current_path()
         self.image_files.sort()
+        self.filmstrip_model.set_paths(self.image_files)
+        self.image_worker.set_paths(self.image_files, self.file_stats, keep_loaded=True)
+        if current_path:
+            row = self.filter_proxy.row_of(current_path)
+            if row >= 0:
+                self.filmstrip.setCurrentIndex(self.filter_proxy.index(row))
 
         self.lbl_status.setText(f"{len(self.image_files)} fotos encontradas.")
-        
-        # Envia a lista para o Buffer Inteligente
-        self.image_worker.set_paths(self.image_files)
+
+        # Notas já dadas na câmera/Lightroom entram em segundo plano
+        qs = QSettings("LeonardoSoft", "SelecionadorFotos")
+        if qs.value("xmp_import", True, type=bool) and self.image_files:
+            self.xmp_importer = XmpImporter(self.image_files)
+            self.xmp_importer.ratings_found.connect(self.on_xmp_ratings_found)
+            self.xmp_importer.import_finished.connect(self.on_xmp_import_finished)
+            self.xmp_importer.start()
         
         # Reseta visual
+        self.progress.setRange(0, 100)
         self.progress.setVisible(False)
-        self.filmstrip.setFocus()
 
-    def add_thumbnail(self, path, pixmap):
-        # Gerenciamento do Cache LRU
-        if path in self.thumbnails_cache:
-            self.thumbnails_cache.move_to_end(path) # Marca como usado recentemente
-        self.thumbnails_cache[path] = pixmap
-        
-        # Se estourar o limite, remove o mais antigo (o primeiro da fila)
-        if len(self.thumbnails_cache) > self.cache_limit:
-            self.thumbnails_cache.popitem(last=False)
-        
-        # Verifica se já tem nota salva no selector e aplica o desenho
-        rating_atual = self.selector.get_rating(path)
-        if rating_atual > 0:
-            pixmap = self.selector.apply_overlay(pixmap, rating_atual)
+    def cancel_xmp_import(self):
+        if self.xmp_importer is not None:
+            self.xmp_importer.cancel()
+            self.xmp_importer.ratings_found.disconnect()
+            self.xmp_importer.import_finished.disconnect()
+            self.xmp_importer.wait()
+            self.xmp_importer = None
+
+    def on_xmp_ratings_found(self, ratings):
+        """Lote de notas XMP: preenche só as fotos ainda sem nota."""
+        if self.sender() is not self.xmp_importer:
+            return
+        changed = self.selector.import_ratings(ratings)
+        if not changed:
+            return
+        for path in changed:
+            self.filmstrip_model.refresh_path(path) # O filtro reage a cada linha alterada
+        self.update_filter_visuals()
+
+    def on_xmp_import_finished(self, total):
+        if self.sender() is not self.xmp_importer:
+            return
+        if total:
+            self.log(f"⭐ {total} notas XMP encontradas na pasta.")
+
+    def current_path(self):
+        """Caminho da foto selecionada na fita (ou None)."""
+        index = self.filmstrip.currentIndex()
+        return index.data(PATH_ROLE) if index.isValid() else None
 
-        item = QListWidgetItem(os.path.basename(path))
-        item.setIcon(QIcon(pixmap))
-        item.setData(Qt.UserRole, path)
-        self.filmstrip.addItem(item)
+    def add_thumbnail(self, path, pixmap):
+        tracer.end(("thumb", path), "signal.thumbnail_loaded")
+        # O worker já guardou a imagem limpa no cache compartilhado (LRU por bytes);
+        # a fita só precisa repintar a linha (o delegate desenha o selo de nota)
+        self.filmstrip_model.refresh_path(path)
 
     def update_preview_slot(self, path, pixmap):
         """Recebe a imagem grande carregada pelo Worker e exibe."""
-        # 1. Guarda no Cache LRU
-        if path in self.previews_cache:
-            self.previews_cache.move_to_end(path)
-        self.previews_cache[path] = pixmap
-        
-        if len(self.previews_cache) > self.preview_cache_limit:
-            self.previews_cache.popitem(last=False)
-
-        # 2. Se for a foto que o usuário está olhando agora, exibe
-        current = self.filmstrip.currentItem()
-        if current and current.data(Qt.UserRole) == path:
-            self.preview_frame.setPixmap(pixmap)
-            self.preview_frame.setText("")
+        tracer.end(("preview", path), "signal.preview_loaded")
+        with span("ui.preview_slot"):
+            # O worker já guardou no cache compartilhado; aqui só exibimos
+            # Se for a foto que o usuário está olhando agora, exibe
+            if self.current_path() == path:
+                self.preview_frame.setPixmap(pixmap)
+                self.preview_frame.setText("")
 
     def on_loading_finished(self):
         self.progress.setVisible(False)
         self.lbl_status.setText("Use 1-5 para classificar (0 limpa).")
-        if self.filmstrip.count() > 0:
-            self.filmstrip.setCurrentRow(0)
+        if self.filter_proxy.rowCount() > 0:
+            self.filmstrip.setCurrentIndex(self.filter_proxy.index(0))
             self.filmstrip.setFocus() # Garante foco no inicio
 
     def on_selection_changed(self, current, previous):
-        if not current: return
+        with span("ui.selection_changed"):
+            if not current.isValid(): return
 
-        # --- NOVO: Força sair do zoom ao trocar de foto ---
-        self.preview_frame.stop_zoom_mode()
-        # --------------------------------------------------
+            # --- NOVO: Força sair do zoom ao trocar de foto ---
+            self.preview_frame.stop_zoom_mode()
+            self.image_worker.cancel_full_resolution()
+            # --------------------------------------------------
         
-        # Scroll suave para centralizar
-        self.filmstrip.scrollToItem(current, QAbstractItemView.PositionAtCenter)
+            # Scroll suave para centralizar
+            self.filmstrip.scrollTo(current, QAbstractItemView.PositionAtCenter)
 
-        path = current.data(Qt.UserRole)
+            path = current.data(PATH_ROLE)
         
-        # Avisa o Worker qual é a posição atual para ele gerenciar o buffer e carregar o preview
-        row = self.filmstrip.row(current)
-        self.image_worker.update_position(row)
+            # Avisa o Worker qual é a posição atual para ele gerenciar o buffer e carregar o preview
+            # (o worker conhece a lista completa: converte a linha filtrada para a original)
+            row = self.filter_proxy.source_row(current.row())
+            self.image_worker.update_position(row)
         
-        # Tenta carregar do cache instantaneamente
-        if path in self.previews_cache:
-            self.preview_frame.setPixmap(self.previews_cache[path])
-            self.previews_cache.move_to_end(path) # Renova a prioridade
-        else:
-            self.preview_frame.clear()
-            self.preview_frame.setText("Carregando...")
+            # Tenta carregar do cache instantaneamente (o get já renova a prioridade)
+            cached_preview = self.previews_cache.get(path)
+            if cached_preview is not None:
+                self.preview_frame.setPixmap(cached_preview)
+            else:
+                self.preview_frame.clear()
+                self.preview_frame.setText("Carregando...")
 
-        self.lbl_status.setText(f"Vendo: {os.path.basename(path)}")
+            self.lbl_status.setText(f"Vendo: {os.path.basename(path)}")
 
     def eventFilter(self, obj, event):
         is_target = (obj is self.filmstrip or obj is self.preview_frame)
         
         if is_target and event.type() == QEvent.KeyPress:
             key = event.key()
+            if self.session_recorder is not None:
+                self.session_recorder.record_key(event, "filmstrip" if obj is self.filmstrip else "preview")
             
             # 1. Lógica do Zoom (Tecla Z)
             if event.text().lower() == 'z':
@@ -540,16 +684,14 @@ class CullingApp(QMainWindow):
                 # CENÁRIO B: Não tem Zoom e o foco está na Imagem -> Navega na lista manualmente
                 # Isso evita chamar setFocus() durante um evento de tecla (o que causava o crash)
                 if obj is self.preview_frame:
-                    row = self.filmstrip.currentRow()
-                    count = self.filmstrip.count()
+                    row = self.filmstrip.currentIndex().row()
+                    count = self.filter_proxy.rowCount()
                     
                     if count > 0:
-                        if key in (Qt.Key_Left, Qt.Key_Up):
-                            row = max(0, row - 1)
-                        elif key in (Qt.Key_Right, Qt.Key_Down):
-                            row = min(count - 1, row + 1)
-                        
-                        self.filmstrip.setCurrentRow(row)
+                        # Toda linha do proxy está visível: basta andar uma
+                        step = -1 if key in (Qt.Key_Left, Qt.Key_Up) else 1
+                        row = max(0, min(row + step, count - 1))
+                        self.filmstrip.setCurrentIndex(self.filter_proxy.index(row))
                     
                     return True # Importante: Dizemos ao Qt "Já resolvi, não faça mais nada"
 
@@ -567,11 +709,10 @@ class CullingApp(QMainWindow):
         if key_char not in valid_keys:
             return False  # Não é tecla de nota, deixa o Qt lidar (ex: setas)
 
-        current_item = self.filmstrip.currentItem()
-        if not current_item:
+        path = self.current_path()
+        if not path:
             return False
 
-        path = current_item.data(Qt.UserRole)
         novo_rating = valid_keys[key_char]
 
         # --- LÓGICA DE TOGGLE (Apertar a mesma tecla remove a nota) ---
@@ -580,45 +721,56 @@ class CullingApp(QMainWindow):
             novo_rating = 0 # Desmarca
         # -------------------------------------------------------------
 
-        # 1. Atualiza Lógica (Selector)
-        self.selector.set_rating(path, novo_rating)
+        with span("ui.rating_key"):
+            # 1. Atualiza Lógica (Selector)
+            self.selector.set_rating(path, novo_rating)
+            if self.xmp_sync:
+                self.xmp_writer.queue(path, novo_rating)
 
-        # 2. Atualiza Visual
-        if path in self.thumbnails_cache:
-            pix_limpo = self.thumbnails_cache[path]
-            # Se novo_rating for 0, o apply_overlay já devolve a imagem limpa
-            pix_novo = self.selector.apply_overlay(pix_limpo, novo_rating)
-            current_item.setIcon(QIcon(pix_novo))
+            # 2. Atualiza Visual (o delegate redesenha o selo da linha) e, com filtro
+            #    ativo, o proxy tira ou põe só esta linha
+            self.filmstrip_model.refresh_path(path)
 
-        # 3. Revalida se a foto ainda deve aparecer na tela
-        self.apply_filters()
-        self.update_filter_visuals()
+            # 3. Botões de filtro (contagens já estão no índice do selector)
+            self.update_filter_visuals()
         
         return True # Confirmamos que tratamos o evento
     
     def toggle_zoom_logic(self):
-        item = self.filmstrip.currentItem()
-        if not item: return
+        path = self.current_path()
+        if not path: return
 
         # SAIR DO ZOOM
         if self.preview_frame._is_zoomed:
+            self.image_worker.cancel_full_resolution()
             self.preview_frame.stop_zoom_mode()
-            self.lbl_status.setText(f"Vendo: {os.path.basename(item.data(Qt.UserRole))}")
+            self.lbl_status.setText(f"Vendo: {os.path.basename(path)}")
             self.filmstrip.setFocus()
             return
 
         # ENTRAR NO ZOOM
-        path = item.data(Qt.UserRole)
+        # 1. Já decodificado recentemente? Entra direto
+        full_img = self.image_cache.full.get(path)
+        if full_img is not None:
+            self.preview_frame.start_zoom_mode(None, full_img.size(), full_img)
+            self.lbl_status.setText("Modo Zoom: Use Scroll ou Botões")
+            return
+
+        # 2. Abre na hora com o preview esticado e pede a resolução máxima em segundo plano
+        preview = self.previews_cache.get(path) or self.preview_frame.current_pixmap
+        if preview is None:
+            self.lbl_status.setText("Erro ao carregar zoom.")
+            return
+        full_size = self.image_worker.get_full_resolution_size(path)
+        self.preview_frame.start_zoom_mode(preview, full_size)
         self.lbl_status.setText("Carregando Zoom HD...")
-        QApplication.processEvents()
+        self.image_worker.request_full_resolution(path)
 
-        full_pix = self.image_worker.get_full_resolution_image(path)
-        
-        if full_pix:
-            self.preview_frame.start_zoom_mode(full_pix)
+    def on_full_resolution_loaded(self, path, image):
+        """A resolução máxima chegou: troca o preview esticado se ainda estivermos nela."""
+        if self.preview_frame._is_zoomed and self.current_path() == path:
+            self.preview_frame.set_zoom_image(image)
             self.lbl_status.setText("Modo Zoom: Use Scroll ou Botões")
-        else:
-            self.lbl_status.setText("Erro ao carregar zoom.")
 
     # --- LÓGICA DE FILTROS ---
 
@@ -635,7 +787,7 @@ class CullingApp(QMainWindow):
     def toggle_main_filter(self):
         """Lógica inteligente: Tudo <-> Classificadas."""
         # Verifica se existe ALGUMA foto com nota no sistema
-        tem_classificadas = any(r > 0 for r in self.selector.get_selected_items().values())
+        tem_classificadas = self.selector.has_ratings()
 
         if not self.active_filters:
             # Estamos vendo "Tudo".
@@ -655,7 +807,7 @@ class CullingApp(QMainWindow):
         is_empty = (len(self.active_filters) == 0)
         
         # Verifica se existe ALGUMA foto com nota > 0
-        tem_classificadas = any(r > 0 for r in self.selector.get_selected_items().values())
+        tem_classificadas = self.selector.has_ratings()
         
         # Estilos
         style_green = "background-color: #27ae60; color: white; border: none; font-weight: bold; border-radius: 4px;"
@@ -684,30 +836,27 @@ class CullingApp(QMainWindow):
             is_selected = i in self.active_filters
             btn.setStyleSheet(style_green if is_selected else style_gray)
             btn.setChecked(is_selected)
+            if i > 0:
+                btn.setToolTip(f"{self.selector.count(i)} fotos com nota {i}")
 
     def apply_filters(self):
-        """Aplica a visibilidade na Fita de Fotos."""
-        count = self.filmstrip.count()
-        
-        # Se vazio, mostra tudo (Otimização)
-        if not self.active_filters:
-            for i in range(count):
-                self.filmstrip.item(i).setHidden(False)
-            return
-
-        # Filtra item por item
-        for i in range(count):
-            item = self.filmstrip.item(i)
-            path = item.data(Qt.UserRole)
-            rating = self.selector.get_rating(path) # Pega a nota real
-            
-            # Se a nota estiver no conjunto, mostra. Senão, esconde.
-            should_show = rating in self.active_filters
-            item.setHidden(not should_show)
+        """Aplica o filtro na Fita de Fotos, mantendo a foto atual (ou a vizinha mais próxima)."""
+        with span("ui.apply_filters"):
+            path = self.current_path()
+            self.filter_proxy.set_filters(self.active_filters)
+            if not path or self.current_path() == path:
+                return
+            row = self.filter_proxy.nearest_row(path)
+            if row >= 0:
+                self.filmstrip.setCurrentIndex(self.filter_proxy.index(row))
 
     def export_files(self):
-        # 1. Recupera TUDO que tem nota
-        all_rated_items = self.selector.get_selected_items()
+        # 1. Recupera TUDO que tem nota (só arquivos que ainda existem na pasta:
+        #    as notas salvas podem incluir fotos apagadas desde a última sessão)
+        all_rated_items = {
+            path: rating for path, rating in self.selector.get_selected_items().items()
+            if self.filmstrip_model.row_of(path) >= 0
+        }
         
         # 2. APLICA A LÓGICA DO FILTRO NA EXPORTAÇÃO
         if self.active_filters:
@@ -763,10 +912,14 @@ class CullingApp(QMainWindow):
         use_resize = qs.value("use_resize", False, type=bool)
         use_quality = qs.value("use_quality", False, type=bool)
         
-        # DECISÃO: Se tiver QUALQUER ajuste ativado, usamos o ImageMagick.
-        # Caso contrário, usamos '[ Sem edição ]' para cópia rápida.
-        if full_auto or use_resize or use_quality:
+        # DECISÃO: ajustes vão para o motor nativo (Qt + NumPy, sem abrir
+        # processo; RAW cai no ImageMagick), a menos que o usuário prefira o
+        # ImageMagick para o Full Auto. Sem ajustes, '[ Sem edição ]' (cópia rápida).
+        full_auto_magick = qs.value("full_auto_magick", False, type=bool)
+        if full_auto and full_auto_magick:
             engine_name = "ImageMagick"
+        elif full_auto or use_resize or use_quality:
+            engine_name = "Nativo"
         else:
             engine_name = "[ Sem edição ]"
 
@@ -777,17 +930,48 @@ class CullingApp(QMainWindow):
             "resize_value": qs.value("resize_value", 1920, type=int),
             "use_quality": use_quality,
             "quality_value": qs.value("quality_value", 75, type=int),
+            "export_workers": qs.value("export_workers", export_manager.default_export_workers(), type=int),
+            "use_hardlink": qs.value("use_hardlink", False, type=bool),
         }
         
         self.log(f"⚙️ Modo de Exportação: {engine_name}")
         # ----------------------------------
 
+        # Imagens já decodificadas (preview/zoom) que cobrem o tamanho pedido:
+        # o QPixmap só pode ser lido aqui, na thread da interface
+        decoded = {}
+        if engine_name == "Nativo" and use_resize:
+            decoded = self.decoded_images_for_export(selected_items, settings_dict["resize_value"])
+
         # Passamos o dicionário para o Worker
-        self.copy_thread = CopyWorker(selected_items, final_path, settings_dict)
+        self.copy_thread = CopyWorker(selected_items, final_path, settings_dict, decoded)
         self.copy_thread.progress_signal.connect(self.log)
         self.copy_thread.finished_signal.connect(self.on_copy_finished)
         self.copy_thread.start()
 
+    def decoded_images_for_export(self, paths, min_side):
+        """
+        Retrato dos caches de RAM no momento da exportação: {caminho: QImage}
+        com lado maior >= min_side. Zoom (resolução máxima) primeiro, senão preview.
+        Previews que vieram do cache de disco ficam de fora: já são um JPEG
+        re-encodado, exportar deles seria uma segunda geração de perda.
+        """
+        images = {}
+        for path in paths:
+            if path.lower().endswith(export_manager.RAW_EXTENSIONS):
+                continue # Preview de RAW é o JPEG embutido, não a revelação
+            img = self.image_cache.full.peek(path)
+            if img is None or max(img.width(), img.height()) < min_side:
+                pixmap = self.previews_cache.peek(path)
+                meta = self.previews_cache.meta(path)
+                img = None
+                if (pixmap is not None and meta is not None and meta.from_original
+                        and max(pixmap.width(), pixmap.height()) >= min_side):
+                    img = pixmap.toImage()
+            if img is not None:
+                images[path] = img
+        return images
+
     def on_copy_finished(self, count):
         """Chamado quando a thread termina."""
         self.btn_export.setEnabled(True)
@@ -801,7 +985,16 @@ class CullingApp(QMainWindow):
 
     def open_settings_dialog(self):
         dialog = SettingsDialog(self)
-        dialog.exec()
+        if dialog.exec():
+            # Aplica na hora o novo tamanho do pool de decodificação
+            qs = QSettings("LeonardoSoft", "SelecionadorFotos")
+            decode_workers = qs.value("decode_workers", default_worker_count(), type=int)
+            self.image_worker.set_worker_count(decode_workers)
+            self.image_worker.set_prefetch_ahead(qs.value("prefetch_ahead", 3, type=int))
+            self.image_worker.set_cache_budget(qs.value("cache_budget_mb", 512, type=int))
+            self.xmp_sync = qs.value("xmp_sync", False, type=bool)
+            self.configure_tracing(qs.value("trace_enabled", False, type=bool))
+            self.log(f"🧵 Threads de leitura: {decode_workers}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,145 @@
+import os
+import uuid
+import hashlib
+from PySide6.QtCore import QMutex, QStandardPaths
+from PySide6.QtGui import QImage
+
+class DiskCache:
+    """
+    Cache persistente em disco para thumbnails e previews já redimensionados.
+    A chave é (caminho, tamanho, mtime, tamanho alvo), então qualquer edição
+    no arquivo original invalida a entrada automaticamente.
+    """
+
+    def __init__(self, folder=None, max_bytes=1024 * 1024 * 1024):
+        if folder is None:
+            base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+            folder = os.path.join(base, "LeonardoSoft", "SelecionadorFotos", "imagens")
+        self.folder = folder
+        self.max_bytes = max_bytes
+
+        # Índice {arquivo_cache: (bytes, atime)} montado sob demanda
+        self._index = None
+        self._total_bytes = 0
+        self.mutex = QMutex()
+
+    # --- CHAVES ---
+
+    def make_key(self, path, target_size, kind, stat=None):
+        """Gera a chave do cache. Retorna None se o arquivo não puder ser lido."""
+        try:
+            st = stat or os.stat(path)
+        except OSError:
+            return None
+        raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{target_size.width()}x{target_size.height()}|{kind}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _file_for(self, key):
+        # Dois níveis de pasta para não colocar milhares de arquivos num diretório só
+        return os.path.join(self.folder, key[:2], key + ".jpg")
+
+    # --- LEITURA / ESCRITA ---
+
+    def get(self, key):
+        """Retorna a QImage guardada ou None."""
+        if key is None:
+            return None
+        cache_file = self._file_for(key)
+        img = QImage(cache_file)
+        if img.isNull():
+            return None
+
+        # Marca como usado recentemente (LRU pelo atime/mtime do arquivo)
+        try:
+            os.utime(cache_file)
+        except OSError:
+            pass
+        return img
+
+    def put(self, key, image, quality=90):
+        """Grava a imagem no cache de forma atômica (tmp + rename)."""
+        if key is None or image is None or image.isNull():
+            return
+        cache_file = self._file_for(key)
+        # Nome temporário único: várias threads do pool podem gravar a mesma chave
+        tmp_file = f"{cache_file}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            if not image.save(tmp_file, "JPG", quality):
+                return
+            os.replace(tmp_file, cache_file)
+            size = os.path.getsize(cache_file)
+        except OSError as e:
+            print(f"Erro ao gravar cache {cache_file}: {e}")
+            return
+
+        self.mutex.lock()
+        try:
+            self._ensure_index()
+            old = self._index.get(cache_file)
+            if old:
+                self._total_bytes -= old[0]
+            self._index[cache_file] = (size, os.path.getmtime(cache_file))
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        finally:
+            self.mutex.unlock()
+
+    def clear(self):
+        self.mutex.lock()
+        try:
+            self._ensure_index()
+            for cache_file in list(self._index):
+                self._remove(cache_file)
+        finally:
+            self.mutex.unlock()
+
+    # --- EVICÇÃO ---
+
+    def _ensure_index(self):
+        """Varre a pasta do cache uma única vez (chamado com o mutex travado)."""
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total_bytes = 0
+        if not os.path.isdir(self.folder):
+            return
+        for sub in os.scandir(self.folder):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if not entry.name.endswith(".jpg"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                self._index[entry.path] = (st.st_size, st.st_mtime)
+                self._total_bytes += st.st_size
+
+    def _evict(self):
+        """Remove os arquivos menos usados até ficar em 90% do limite."""
+        target = int(self.max_bytes * 0.9)
+        # Atualiza o tempo de uso real (os hits fazem utime sem passar pelo índice)
+        entries = []
+        for cache_file, (size, mtime) in self._index.items():
+            try:
+                mtime = os.path.getmtime(cache_file)
+            except OSError:
+                pass
+            entries.append((mtime, cache_file))
+        entries.sort()
+
+        for _, cache_file in entries:
+            if self._total_bytes <= target:
+                break
+            self._remove(cache_file)
+
+    def _remove(self, cache_file):
+        size, _ = self._index.pop(cache_file, (0, 0))
+        self._total_bytes -= size
+        try:
+            os.remove(cache_file)
+        except OSError:
+            pass
@@ -0,0 +1,465 @@
+import mmap
+import struct
+from collections import namedtuple
+from PySide6.QtCore import QFile, QIODevice
+from PySide6.QtGui import QImage, QImageReader, QTransform
+
+# Tags TIFF/EXIF que usamos
+TAG_ORIENTATION = 0x0112
+TAG_EXIF_IFD = 0x8769
+TAG_JPEG_OFFSET = 0x0201        # JPEGInterchangeFormat
+TAG_JPEG_LENGTH = 0x0202        # JPEGInterchangeFormatLength
+TAG_PIXEL_X = 0xA002
+TAG_PIXEL_Y = 0xA003
+TAG_COMPRESSION = 0x0103
+TAG_STRIP_OFFSETS = 0x0111
+TAG_STRIP_BYTE_COUNTS = 0x0117
+TAG_SUB_IFDS = 0x014A
+TAG_XMP = 0x02BC                # XMLPacket (XMP dentro de TIFF/RAW)
+
+# Identificador do segmento APP1 que guarda o XMP num JPEG
+XMP_APP1_PREFIX = b"http://ns.adobe.com/xap/1.0/\x00"
+
+# Compressões TIFF que podem guardar um JPEG (6 = JPEG antigo, 7 = JPEG novo)
+JPEG_COMPRESSIONS = (6, 7)
+
+# JPEG embutido num RAW: posição no arquivo e dimensões lidas do marcador SOF
+EmbeddedJpeg = namedtuple("EmbeddedJpeg", "offset length width height")
+
+# Tamanho em bytes de cada tipo TIFF
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+
+class TiffReader:
+    """
+    Leitor mínimo de estruturas TIFF (cabeçalho + IFDs) sobre um buffer
+    (bytes ou mmap). 'base' é onde o cabeçalho TIFF começa dentro do buffer;
+    todos os offsets do TIFF são relativos a ele.
+    """
+
+    def __init__(self, buf, base=0):
+        self.buf = buf
+        self.base = base
+
+        order = bytes(buf[base:base + 2])
+        if order == b"II":
+            self.endian = "<"
+        elif order == b"MM":
+            self.endian = ">"
+        else:
+            raise ValueError("Cabeçalho TIFF inválido")
+
+        # 42 = TIFF padrão; 0x4F52/0x5352 = variantes da Olympus (ORF)
+        magic, self.first_ifd = struct.unpack_from(self.endian + "HI", buf, base + 2)
+        if magic not in (42, 0x4F52, 0x5352, 0x55):
+            raise ValueError("Cabeçalho TIFF inválido")
+
+    def read_ifd(self, offset):
+        """Retorna ({tag: (tipo, contagem, offset_do_valor)}, offset_do_próximo_IFD)."""
+        pos = self.base + offset
+        if offset <= 0 or pos + 2 > len(self.buf):
+            return {}, 0
+        (count,) = struct.unpack_from(self.endian + "H", self.buf, pos)
+        pos += 2
+        if pos + count * 12 + 4 > len(self.buf):
+            return {}, 0
+
+        entries = {}
+        for _ in range(count):
+            tag, typ, n = struct.unpack_from(self.endian + "HHI", self.buf, pos)
+            size = TYPE_SIZES.get(typ, 1) * n
+            if size <= 4:
+                value_pos = pos + 8 # Valor cabe dentro da própria entrada
+            else:
+                (value_offset,) = struct.unpack_from(self.endian + "I", self.buf, pos + 8)
+                value_pos = self.base + value_offset
+            entries[tag] = (typ, n, value_pos)
+            pos += 12
+
+        (next_ifd,) = struct.unpack_from(self.endian + "I", self.buf, pos)
+        return entries, next_ifd
+
+    def values(self, entry):
+        """Lê os valores inteiros de uma entrada (BYTE/SHORT/LONG/IFD)."""
+        typ, n, value_pos = entry
+        fmt = {1: "B", 3: "H", 4: "I", 7: "B", 9: "i", 13: "I"}.get(typ)
+        if fmt is None or value_pos + TYPE_SIZES[typ] * n > len(self.buf):
+            return []
+        return list(struct.unpack_from(self.endian + fmt * n, self.buf, value_pos))
+
+    def value(self, entries, tag, default=None):
+        entry = entries.get(tag)
+        if entry is None:
+            return default
+        vals = self.values(entry)
+        return vals[0] if vals else default
+
+    def ifd_chain(self, limit=8):
+        """Lista de IFDs encadeados a partir do IFD0 (IFD0, IFD1, ...)."""
+        chain = []
+        offset = self.first_ifd
+        seen = set()
+        while offset and offset not in seen and len(chain) < limit:
+            seen.add(offset)
+            entries, offset = self.read_ifd(offset)
+            if not entries:
+                break
+            chain.append(entries)
+        return chain
+
+def _read_exif_segment(path):
+    """
+    Percorre só os marcadores do cabeçalho do JPEG e devolve o conteúdo do
+    segmento APP1/Exif (sem ler o resto do arquivo).
+    """
+    return _read_app1_segment(path, b"Exif\x00\x00")
+
+def _read_app1_segment(path, prefix):
+    """Primeiro segmento APP1 do cabeçalho que começa com 'prefix' (com o prefixo)."""
+    with open(path, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            return None
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            code = marker[1]
+            # SOS ou EOI: acabou o cabeçalho, não tem EXIF
+            if code in (0xDA, 0xD9):
+                return None
+            if code == 0x01 or 0xD0 <= code <= 0xD7:
+                continue # Marcadores sem tamanho
+            length_bytes = f.read(2)
+            if len(length_bytes) < 2:
+                return None
+            (length,) = struct.unpack(">H", length_bytes)
+            if code == 0xE1:
+                data = f.read(length - 2)
+                if data.startswith(prefix):
+                    return data
+            else:
+                f.seek(length - 2, 1)
+
+def read_exif_thumbnail(path):
+    """
+    Retorna (bytes_do_jpeg, orientação, (largura, altura) da foto principal)
+    lidos do IFD1 do EXIF, ou None se o arquivo não tiver thumbnail embutida.
+    """
+    try:
+        data = _read_exif_segment(path)
+        if not data:
+            return None
+
+        tiff = TiffReader(data, base=6)
+        chain = tiff.ifd_chain(limit=2)
+        if len(chain) < 2:
+            return None
+        ifd0, ifd1 = chain[0], chain[1]
+
+        offset = tiff.value(ifd1, TAG_JPEG_OFFSET)
+        length = tiff.value(ifd1, TAG_JPEG_LENGTH)
+        if not offset or not length:
+            return None
+        start = tiff.base + offset
+        if start + length > len(data):
+            return None
+
+        orientation = tiff.value(ifd0, TAG_ORIENTATION, 1)
+
+        # Dimensões reais da foto, para descobrir tarjas pretas na thumbnail
+        main_size = None
+        exif_offset = tiff.value(ifd0, TAG_EXIF_IFD)
+        if exif_offset:
+            exif_ifd, _ = tiff.read_ifd(exif_offset)
+            px = tiff.value(exif_ifd, TAG_PIXEL_X)
+            py = tiff.value(exif_ifd, TAG_PIXEL_Y)
+            if px and py:
+                main_size = (px, py)
+
+        return data[start:start + length], orientation, main_size
+    except (OSError, ValueError, struct.error):
+        return None
+
+def orientation_transform(orientation):
+    """QTransform equivalente à tag Orientation do EXIF."""
+    t = QTransform()
+    if orientation == 2:
+        t.scale(-1, 1)
+    elif orientation == 3:
+        t.rotate(180)
+    elif orientation == 4:
+        t.scale(1, -1)
+    elif orientation == 5:
+        t.rotate(90)
+        t.scale(-1, 1)
+    elif orientation == 6:
+        t.rotate(90)
+    elif orientation == 7:
+        t.rotate(-90)
+        t.scale(-1, 1)
+    elif orientation == 8:
+        t.rotate(-90)
+    return t
+
+def load_exif_thumbnail(path):
+    """
+    Decodifica a thumbnail do EXIF já recortada (sem tarjas) e rotacionada.
+    Retorna uma QImage ou None.
+    """
+    found = read_exif_thumbnail(path)
+    if not found:
+        return None
+    jpeg_bytes, orientation, main_size = found
+
+    img = QImage.fromData(jpeg_bytes)
+    if img.isNull():
+        return None
+
+    # Algumas câmeras gravam 160x120 fixo e preenchem uma foto 3:2 com tarjas pretas
+    if main_size:
+        main_ratio = main_size[0] / main_size[1]
+        thumb_ratio = img.width() / img.height()
+        if abs(main_ratio - thumb_ratio) > 0.02:
+            if main_ratio > thumb_ratio:
+                h = int(round(img.width() / main_ratio))
+                img = img.copy(0, (img.height() - h) // 2, img.width(), h)
+            else:
+                w = int(round(img.height() * main_ratio))
+                img = img.copy((img.width() - w) // 2, 0, w, img.height())
+
+    if orientation and orientation != 1:
+        img = img.transformed(orientation_transform(orientation))
+    return img
+
+# --- EXIF NOS ARQUIVOS RE-ENCODADOS PELA EXPORTAÇÃO ---
+
+def _set_int_value(tiff, entry, value):
+    """Troca o valor de uma entrada SHORT/LONG de contagem 1 dentro do buffer."""
+    typ, n, value_pos = entry
+    fmt = {3: "H", 4: "I"}.get(typ)
+    if fmt is None or n != 1 or value_pos + TYPE_SIZES[typ] > len(tiff.buf):
+        return
+    struct.pack_into(tiff.endian + fmt, tiff.buf, value_pos, value)
+
+def exif_for_export(path, size=None):
+    """
+    Segmento APP1/Exif do JPEG original pronto para a cópia re-encodada
+    (data, câmera, copyright, GPS...). A rotação já está nos pixels, então a
+    Orientation vira 1 e a thumbnail do IFD1 (na orientação antiga) sai da
+    cadeia; com 'size' (QSize), PixelX/YDimension passam a ser o tamanho novo.
+    Retorna os bytes do segmento (com o prefixo "Exif") ou None.
+    """
+    try:
+        data = _read_exif_segment(path)
+        if not data:
+            return None
+        data = bytearray(data)
+        tiff = TiffReader(data, base=6)
+        ifd0, _ = tiff.read_ifd(tiff.first_ifd)
+        if not ifd0:
+            return None
+
+        entry = ifd0.get(TAG_ORIENTATION)
+        if entry is not None and tiff.value(ifd0, TAG_ORIENTATION, 1) != 1:
+            _set_int_value(tiff, entry, 1)
+            ifd0_pos = tiff.base + tiff.first_ifd
+            (count,) = struct.unpack_from(tiff.endian + "H", data, ifd0_pos)
+            struct.pack_into(tiff.endian + "I", data, ifd0_pos + 2 + count * 12, 0)
+
+        exif_offset = tiff.value(ifd0, TAG_EXIF_IFD)
+        if size is not None and exif_offset:
+            exif_ifd, _ = tiff.read_ifd(exif_offset)
+            if TAG_PIXEL_X in exif_ifd and TAG_PIXEL_Y in exif_ifd:
+                _set_int_value(tiff, exif_ifd[TAG_PIXEL_X], size.width())
+                _set_int_value(tiff, exif_ifd[TAG_PIXEL_Y], size.height())
+        return bytes(data)
+    except (OSError, ValueError, struct.error):
+        return None
+
+# Tabela de quantização de luminância padrão do IJG (qualidade 50), base do -quality dos encoders
+IJG_LUMINANCE_TABLE_SUM = sum((
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99,
+))
+
+def estimate_jpeg_quality(path):
+    """
+    Qualidade (1-100) com que o JPEG foi gravado, estimada pela tabela de
+    quantização de luminância (DQT 0) contra a do IJG, lendo só o cabeçalho.
+    Mesma ideia do ImageMagick quando não recebe -quality. None se não der.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xDA, 0xD9):
+                    return None
+                if marker[1] == 0x01 or 0xD0 <= marker[1] <= 0xD7:
+                    continue
+                (length,) = struct.unpack(">H", f.read(2))
+                data = f.read(length - 2)
+                if marker[1] != 0xDB:
+                    continue
+                pos = 0
+                while pos < len(data):
+                    precision, table_id = data[pos] >> 4, data[pos] & 0x0F
+                    size = 128 if precision else 64
+                    values = struct.unpack_from(">64H" if precision else "64B", data, pos + 1)
+                    pos += 1 + size
+                    if table_id != 0:
+                        continue
+                    # Escala inversa do IJG: q<50 -> 5000/q %, q>=50 -> 200-2q %
+                    scale = sum(values) * 100 / IJG_LUMINANCE_TABLE_SUM
+                    quality = (200 - scale) / 2 if scale <= 100 else 5000 / scale
+                    return max(1, min(100, round(quality)))
+    except (OSError, struct.error):
+        return None
+
+def insert_exif(jpeg, exif):
+    """
+    Coloca o segmento APP1/Exif num JPEG recém-codificado (que não tem EXIF):
+    logo depois do SOI, ou do APP0/JFIF quando houver.
+    """
+    if not jpeg.startswith(b"\xff\xd8") or len(exif) + 2 > 0xFFFF:
+        return jpeg
+    pos = 2
+    if jpeg[pos:pos + 2] == b"\xff\xe0":
+        (length,) = struct.unpack_from(">H", jpeg, pos + 2)
+        pos += 2 + length
+    segment = b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    return jpeg[:pos] + segment + jpeg[pos:]
+
+# --- JPEGs EMBUTIDOS EM RAW (ARW, NEF, CR2, DNG, ORF) ---
+
+def _jpeg_dimensions(buf, pos, end):
+    """
+    Lê as dimensões do marcador SOF de um JPEG dentro do buffer. Retorna None
+    para JPEG sem perdas (SOF3, usado nos dados RAW do CR2/DNG), que o Qt não
+    decodifica e que não é um preview.
+    """
+    if bytes(buf[pos:pos + 2]) != b"\xff\xd8":
+        return None
+    pos += 2
+    while pos + 4 <= end:
+        if buf[pos] != 0xFF:
+            return None
+        code = buf[pos + 1]
+        if code == 0xFF:
+            pos += 1 # Preenchimento
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            pos += 2
+            continue
+        if code in (0xDA, 0xD9):
+            return None
+        (length,) = struct.unpack_from(">H", buf, pos + 2)
+        if code in (0xC0, 0xC1, 0xC2):
+            if pos + 9 > end:
+                return None
+            height, width = struct.unpack_from(">HH", buf, pos + 5)
+            return width, height
+        if 0xC3 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            return None # Lossless/aritmético: não serve
+        pos += 2 + length
+    return None
+
+def _scan_embedded_jpegs(buf):
+    """Percorre IFD0, IFDs encadeados e SubIFDs procurando JPEGs."""
+    tiff = TiffReader(buf)
+    found = {}
+    pending = [tiff.first_ifd]
+    seen = set()
+
+    while pending and len(seen) < 32:
+        offset = pending.pop(0)
+        if not offset or offset in seen:
+            continue
+        seen.add(offset)
+        entries, next_ifd = tiff.read_ifd(offset)
+        if not entries:
+            continue
+        pending.append(next_ifd)
+        if TAG_SUB_IFDS in entries:
+            pending.extend(tiff.values(entries[TAG_SUB_IFDS]))
+
+        candidates = []
+        # 1. JPEGInterchangeFormat (thumbnail/preview no estilo EXIF)
+        jpeg_offset = tiff.value(entries, TAG_JPEG_OFFSET)
+        jpeg_length = tiff.value(entries, TAG_JPEG_LENGTH)
+        if jpeg_offset and jpeg_length:
+            candidates.append((jpeg_offset, jpeg_length))
+
+        # 2. Strip único com compressão JPEG (CR2 IFD0, previews do DNG/NEF)
+        if tiff.value(entries, TAG_COMPRESSION) in JPEG_COMPRESSIONS and TAG_STRIP_OFFSETS in entries:
+            strips = tiff.values(entries[TAG_STRIP_OFFSETS])
+            counts = tiff.values(entries.get(TAG_STRIP_BYTE_COUNTS, (4, 0, 0)))
+            if len(strips) == 1 and len(counts) == 1:
+                candidates.append((strips[0], counts[0]))
+
+        for start, length in candidates:
+            if start in found or start + length > len(buf):
+                continue
+            dims = _jpeg_dimensions(buf, start, start + length)
+            if dims:
+                found[start] = EmbeddedJpeg(start, length, dims[0], dims[1])
+
+    return sorted(found.values(), key=lambda j: j.width * j.height)
+
+def find_embedded_jpegs(path):
+    """
+    Mapeia o RAW em memória (sem ler o arquivo inteiro) e devolve os JPEGs
+    embutidos, do menor para o maior. Lista vazia se o formato não for TIFF.
+    """
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return _scan_embedded_jpegs(mm)
+    except (OSError, ValueError, struct.error):
+        return []
+
+def read_xmp_packet(path):
+    """
+    Pacote XMP gravado dentro do arquivo (bytes) ou None, lendo só o
+    cabeçalho: segmento APP1 no JPEG, tag XMLPacket nos IFDs de TIFF/RAW.
+    """
+    try:
+        with open(path, "rb") as f:
+            is_jpeg = f.read(2) == b"\xff\xd8"
+        if is_jpeg:
+            data = _read_app1_segment(path, XMP_APP1_PREFIX)
+            return data[len(XMP_APP1_PREFIX):] if data else None
+
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                tiff = TiffReader(mm)
+                for entries in tiff.ifd_chain():
+                    entry = entries.get(TAG_XMP)
+                    if entry is not None:
+                        typ, n, pos = entry
+                        return bytes(mm[pos:pos + n]) if pos + n <= len(mm) else None
+    except (OSError, ValueError, struct.error):
+        pass
+    return None
+
+def read_embedded_jpeg(path, jpeg, scaled_size=None):
+    """
+    Decodifica um JPEG embutido direto do arquivo: o QImageReader lê a partir
+    do offset, sem copiar os bytes para o Python. Com scaled_size, o libjpeg
+    já decodifica reduzido (ideal para thumbnails).
+    """
+    f = QFile(path)
+    if not f.open(QIODevice.ReadOnly):
+        return None
+    try:
+        if not f.seek(jpeg.offset):
+            return None
+        reader = QImageReader(f, b"jpeg")
+        if scaled_size is not None:
+            reader.setScaledSize(scaled_size)
+        img = reader.read()
+        return None if img.isNull() else img
+    finally:
+        f.close()
@@ -1,71 +1,736 @@
 import os
+import re
+import sys
+import json
+import time
+import uuid
+import hashlib
 import shutil
 import platform
 import subprocess
 import tempfile
+import threading
+import itertools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from PySide6.QtCore import Qt, QSize, QBuffer, QByteArray, QIODevice
+from PySide6.QtGui import QImageReader, QImageWriter, QImageIOHandler
+from auto_correct import apply_full_auto
+from exif_reader import exif_for_export, insert_exif, estimate_jpeg_quality
+from tracing import span
 
 # Detecta o sistema operacional uma única vez
 IS_WINDOWS = platform.system() == "Windows"
 
-def export_file(source_path, dest_folder, settings):
+# O Qt não decodifica RAW: esses continuam indo para o ImageMagick no motor nativo
+RAW_EXTENSIONS = ('.arw', '.cr2', '.nef', '.dng', '.orf')
+
+# Arquivos por tarefa no pool de processos (o Full Auto em NumPy segura o GIL)
+PROCESS_BATCH_SIZE = 4
+
+# Saídas que recebem o EXIF do original (o resto sai como o Qt gravar)
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+# Qualidade do JPEG sem "use_quality" quando não dá para estimar a do original
+# (o default do Qt, 75, entregaria pior que o convert, que mantém a do original)
+DEFAULT_JPEG_QUALITY = 92
+
+# Cópia sem edição
+FICLONE = 0x40049409               # ioctl do Linux para reflink (btrfs, XFS, bcachefs...)
+COPY_CHUNK = 64 * 1024 * 1024      # Bytes por chamada de copy_file_range/sendfile
+COPY_BUFFER = 8 * 1024 * 1024      # Buffer do fallback em espaço de usuário
+
+# Teto de arquivos por chamada do mogrify (progresso e cancelamento não ficam presos num lote enorme)
+MAGICK_BATCH_MAX = 32
+
+def default_export_workers():
+    """Um arquivo por núcleo (cada convert roda com 1 thread quando há paralelismo), com teto."""
+    return max(1, min(8, os.cpu_count() or 1))
+
+MANIFEST_NAME = ".passa_ou_repassa_manifest.jsonl"
+
+# Saídas provisórias (".IMG_1.jpg.<uuid>.part"): ocultas e sem extensão de
+# imagem, para um crash não deixar na entrega algo que pareça foto
+TEMP_SUFFIX = ".part"
+TEMP_NAME_RE = re.compile(r"^\..+\.[0-9a-f]{32}\.part$")
+
+# Configurações que mudam o conteúdo do arquivo exportado (o resto é só "como")
+OUTPUT_SETTINGS = ('engine_name', 'full_auto', 'full_auto_magick', 'use_resize',
+                   'resize_value', 'use_quality', 'quality_value')
+
+def settings_hash(settings):
+    relevant = {key: settings.get(key) for key in OUTPUT_SETTINGS}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def file_checksum(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ExportManifest:
+    """
+    Diário da exportação, gravado na pasta de destino (uma linha JSON por
+    arquivo concluído, com fsync). Guarda origem (tamanho, mtime), hash das
+    configurações e saída (tamanho, mtime, checksum). Numa nova exportação
+    para a mesma pasta, o que já está em dia é pulado: retoma uma exportação
+    interrompida e processa só as fotos novas.
+    """
+
+    def __init__(self, dest_folder):
+        self.path = os.path.join(dest_folder, MANIFEST_NAME)
+        self.entries = {} # {nome do arquivo de saída: registro}
+        self._lines = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return
+
+        # Crash no meio de uma gravação: corta a linha incompleta para não
+        # grudar a próxima entrada nela
+        if data and not data.endswith(b"\n"):
+            data = data[:data.rfind(b"\n") + 1]
+            with open(self.path, "r+b") as f:
+                f.truncate(len(data))
+
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self.entries[entry["out"]] = entry # A linha mais recente vale
+            self._lines += 1
+
+        # Muitas linhas repetidas (várias reexportações): reescreve compacto
+        if self._lines > 2 * len(self.entries) + 100:
+            self._compact()
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._lines = len(self.entries)
+
+    def is_up_to_date(self, src, dst, config_hash):
+        entry = self.entries.get(os.path.basename(dst))
+        if entry is None or entry.get("settings") != config_hash or entry.get("src") != os.path.abspath(src):
+            return False
+        try:
+            st_src = os.stat(src)
+            st_dst = os.stat(dst)
+        except OSError:
+            return False # Saída apagada pelo usuário: refaz
+        return (entry["src_size"] == st_src.st_size and entry["src_mtime_ns"] == st_src.st_mtime_ns
+                and entry["out_size"] == st_dst.st_size and entry["out_mtime_ns"] == st_dst.st_mtime_ns)
+
+    def record(self, src, dst, config_hash, checksum):
+        """
+        Registra uma saída concluída (só depois do sucesso, então parciais nunca
+        entram). O checksum vem pronto do worker que exportou o arquivo.
+        """
+        st_src = os.stat(src)
+        st_dst = os.stat(dst)
+        entry = {
+            "out": os.path.basename(dst),
+            "src": os.path.abspath(src),
+            "src_size": st_src.st_size,
+            "src_mtime_ns": st_src.st_mtime_ns,
+            "settings": config_hash,
+            "out_size": st_dst.st_size,
+            "out_mtime_ns": st_dst.st_mtime_ns,
+            "blake2b": checksum,
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[entry["out"]] = entry
+        self._lines += 1
+
+def _output_checksum(dst, success, wanted):
+    """Checksum da saída para o diário, calculado no worker (em paralelo com os outros arquivos)."""
+    if not (success and wanted):
+        return None
+    try:
+        with span("export.checksum"):
+            return file_checksum(dst)
+    except OSError:
+        return None
+
+def _export_batch(paths, dest_folder, settings, with_checksum=False):
+    """Roda dentro de um processo do pool: exporta um lote e devolve [(caminho, sucesso, bytes, checksum)]."""
+    results = []
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        success = export_file(path, dest_folder, settings)
+        dst = os.path.join(dest_folder, os.path.basename(path))
+        results.append((path, success, size, _output_checksum(dst, success, with_checksum)))
+    return results
+
+class ExportScheduler:
+    """
+    Roda export_file em N threads ao mesmo tempo. Cada thread passa o tempo
+    esperando um processo do ImageMagick ou o disco, então o GIL não atrapalha.
+    A exceção é o Full Auto nativo (NumPy), que é CPU em Python: vai para um
+    pool de processos, em lotes.
+    O cancelamento é cooperativo: o que está na fila é descartado e os
+    processos em andamento são encerrados dentro de export_file.
+    """
+
+    def __init__(self, dest_folder, settings, workers=None, decoded=None):
+        self.dest_folder = dest_folder
+        self.settings = dict(settings)
+        self.workers = max(1, workers or default_export_workers())
+        self.cancel_event = threading.Event()
+        # {caminho: QImage} já decodificado pela UI (preview/zoom) no tamanho alvo ou maior
+        self.decoded = dict(decoded or {})
+        self.from_memory = 0
+        self.count_lock = threading.Lock() # from_memory é somado por várias threads
+
+        # N processos do ImageMagick com OpenMP cada um disputariam os mesmos núcleos
+        if self.workers > 1:
+            self.settings.setdefault('magick_thread_limit', 1)
+
+        self.use_processes = (self.workers > 1 and self.settings.get('full_auto')
+                              and self.settings.get('engine_name') == 'Nativo')
+
+        self.config_hash = settings_hash(self.settings)
+        self.manifest = None # Aberto em plan(), quando a pasta de destino já existe
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def _export_one(self, path):
+        if self.cancel_event.is_set():
+            return None, 0, None # Nem começou
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        decoded = self.decoded.pop(path, None) # Solta a memória assim que usar
+        success, from_memory = _export_file(path, self.dest_folder, self.settings, self.cancel_event, decoded)
+        if success and from_memory:
+            with self.count_lock:
+                self.from_memory += 1
+        if not success and self.cancel_event.is_set():
+            return None, 0, None # Interrompido pelo cancelamento, não é falha do arquivo
+        return success, size, _output_checksum(self._dest_path(path), success, self.manifest is not None)
+
+    def _export_magick_batch(self, paths):
+        if self.cancel_event.is_set():
+            return [(path, None, 0, None) for path in paths]
+        sizes = {}
+        for path in paths:
+            try:
+                sizes[path] = os.path.getsize(path)
+            except OSError:
+                sizes[path] = 0
+        results = export_magick_batch(paths, self.dest_folder, self.settings, self.cancel_event)
+        with_checksum = self.manifest is not None
+        return [(path, success, sizes[path], _output_checksum(self._dest_path(path), success, with_checksum))
+                for path, success in results]
+
+    def _magick_batches(self, paths):
+        """Divide os arquivos do ImageMagick em lotes, pelo menos um por worker."""
+        if len(paths) < 2:
+            return []
+        size = min(MAGICK_BATCH_MAX, max(2, -(-len(paths) // self.workers)))
+        return [paths[i:i + size] for i in range(0, len(paths), size)]
+
+    def _run_threads(self, paths):
+        """Gera (caminho, sucesso, bytes, checksum) conforme as threads terminam."""
+        # Arquivos que vão para o ImageMagick saem em lotes (um mogrify por lote)
+        magick = [path for path in paths if uses_imagemagick(path, self.settings)]
+        batches = self._magick_batches(magick)
+        batched = {path for batch in batches for path in batch}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._export_magick_batch, batch): batch for batch in batches}
+            futures.update({pool.submit(self._export_one, path): [path]
+                            for path in paths if path not in batched})
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                try:
+                    results = future.result()
+                    if not isinstance(results, list):
+                        results = [(futures[future][0], *results)]
+                except Exception as e:
+                    print(f"❌ Erro ao exportar {', '.join(os.path.basename(p) for p in futures[future])}: {e}")
+                    results = [(path, False, 0, None) for path in futures[future]]
+                if self.cancel_event.is_set():
+                    # Os que ainda não começaram nem chegam a rodar
+                    for pending in futures:
+                        pending.cancel()
+                yield from results
+
+    def _run_processes(self, paths):
+        """
+        Igual a _run_threads, mas em processos e em lotes. Um lote já iniciado
+        termina (são poucos arquivos); os da fila são cancelados.
+        """
+        batches = [paths[i:i + PROCESS_BATCH_SIZE] for i in range(0, len(paths), PROCESS_BATCH_SIZE)]
+        if not batches:
+            return
+        # 'spawn': não herda as threads do Qt do processo principal
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(batches)), mp_context=context) as pool:
+            futures = {pool.submit(_export_batch, batch, self.dest_folder, self.settings,
+                                   self.manifest is not None): batch
+                       for batch in batches}
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"❌ Erro no lote de exportação: {e}")
+                    results = [(path, False, 0, None) for path in futures[future]]
+                if self.cancel_event.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                yield from results
+
+    def _dest_path(self, path):
+        return os.path.join(self.dest_folder, os.path.basename(path))
+
+    def plan(self, paths):
+        """
+        Lê o diário da pasta de destino e separa o que falta exportar.
+        Retorna (pendentes, em_dia). Apaga as saídas provisórias que um
+        crash de uma exportação anterior deixou para trás.
+        """
+        _remove_stale_temps(self.dest_folder)
+        self.manifest = ExportManifest(self.dest_folder)
+        pending, up_to_date = [], []
+        for path in paths:
+            if self.manifest.is_up_to_date(path, self._dest_path(path), self.config_hash):
+                up_to_date.append(path)
+            else:
+                pending.append(path)
+        return pending, up_to_date
+
+    def run(self, paths, on_result=None):
+        """
+        Exporta 'paths' e chama on_result(caminho, sucesso, feitos, total) a cada
+        arquivo concluído, na thread que chamou run. Retorna um resumo (dict).
+        Se plan() foi chamado antes, cada sucesso é registrado no diário.
+        """
+        total = len(paths)
+        done = ok = 0
+        total_bytes = 0
+        start = time.perf_counter()
+
+        if self.use_processes and len(paths) > 1:
+            # RAW continua no ImageMagick (lotes em threads) depois dos nativos
+            # Os que já têm imagem na memória ficam nas threads (QImage não vai para outro processo)
+            native = [path for path in paths
+                      if not uses_imagemagick(path, self.settings) and path not in self.decoded]
+            native_set = set(native)
+            others = [path for path in paths if path not in native_set]
+            results = itertools.chain(self._run_processes(native), self._run_threads(others))
+        else:
+            results = self._run_threads(paths)
+
+        for path, success, size, checksum in results:
+            if success is None:
+                continue
+            done += 1
+            if success:
+                ok += 1
+                total_bytes += size
+                if self.manifest is not None and checksum is not None:
+                    try:
+                        with span("export.manifest_record"):
+                            self.manifest.record(path, self._dest_path(path), self.config_hash, checksum)
+                    except OSError as e:
+                        print(f"Aviso: diário de exportação não atualizado ({e})")
+            if on_result and not self.cancel_event.is_set():
+                on_result(path, success, done, total)
+
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        return {
+            "total": total,
+            "ok": ok,
+            "failed": done - ok,
+            "skipped": total - done,
+            "from_memory": self.from_memory,
+            "cancelled": self.cancel_event.is_set(),
+            "seconds": elapsed,
+            "files_per_sec": ok / elapsed,
+            "mb_per_sec": total_bytes / (1024 * 1024) / elapsed,
+        }
+
+def uses_imagemagick(source_path, settings):
+    """Se este arquivo, com estas configurações, vai ser processado pelo ImageMagick."""
+    engine = settings.get('engine_name', '[ Sem edição ]')
+    if engine == 'ImageMagick':
+        return True
+    return engine == 'Nativo' and source_path.lower().endswith(RAW_EXTENSIONS)
+
+def can_encode_decoded(source_path, settings):
+    """Se dá para exportar este arquivo a partir de uma imagem já decodificada (motor nativo + resize)."""
+    return (settings.get('engine_name') == 'Nativo' and bool(settings.get('use_resize'))
+            and bool(settings.get('resize_value')) and not uses_imagemagick(source_path, settings))
+
+def export_file(source_path, dest_folder, settings, cancel_event=None, decoded=None):
     """
     Função Mestra de Exportação (Versão Lite).
+    'cancel_event' (threading.Event) interrompe um processamento em andamento.
+    'decoded' (QImage), se vier, evita decodificar o original de novo.
     """
+    return _export_file(source_path, dest_folder, settings, cancel_event, decoded)[0]
+
+def _export_file(source_path, dest_folder, settings, cancel_event=None, decoded=None):
+    """export_file que também diz se a saída veio da imagem da memória: (sucesso, da_memória)."""
     filename = os.path.basename(source_path)
     final_dest_path = os.path.join(dest_folder, filename)
     
     engine = settings.get('engine_name', '[ Sem edição ]')
 
     try:
-        if engine == 'ImageMagick':
-            return _process_imagemagick(source_path, final_dest_path, settings)
+        if cancel_event is not None and cancel_event.is_set():
+            return False, False
+
+        # Destino = pasta de origem: qualquer motor gravaria por cima do original
+        if _is_source(source_path, final_dest_path):
+            print(f"❌ {filename}: o destino é o próprio arquivo original, não exportado.")
+            return False, False
+
+        if decoded is not None and can_encode_decoded(source_path, settings):
+            with span("export.from_memory", path=source_path):
+                return _encode_decoded(source_path, decoded, final_dest_path, settings)
+        elif uses_imagemagick(source_path, settings):
+            with span("export.imagemagick", path=source_path):
+                return _process_imagemagick(source_path, final_dest_path, settings, cancel_event), False
+        elif engine == 'Nativo':
+            with span("export.native", path=source_path):
+                return _process_native(source_path, final_dest_path, settings), False
         else:
             # Padrão: Cópia simples
-            return _copy_simple(source_path, final_dest_path)
+            with span("export.copy", path=source_path):
+                return _copy_simple(source_path, final_dest_path, settings, cancel_event), False
 
     except Exception as e:
         print(f"❌ Erro crítico ao exportar {filename}: {e}")
+        return False, False
+
+def _is_source(src, dst):
+    """
+    Se 'dst' é o próprio original (exportando para a pasta de origem). Um
+    hardlink do original em outra pasta não conta: esse é substituído.
+    """
+    try:
+        return (os.path.basename(src) == os.path.basename(dst)
+                and os.path.samefile(os.path.dirname(os.path.abspath(src)), os.path.dirname(os.path.abspath(dst))))
+    except OSError:
         return False
 
-def _copy_simple(src, dst):
-    """Cópia burra: apenas duplica o arquivo."""
+def _temp_path(dst):
+    """Nome provisório na pasta de destino (o os.replace final precisa do mesmo volume)."""
+    folder, name = os.path.split(dst)
+    return os.path.join(folder, f".{name}.{uuid.uuid4().hex}{TEMP_SUFFIX}")
+
+def _remove_stale_temps(dest_folder):
+    try:
+        names = os.listdir(dest_folder)
+    except OSError:
+        return
+    for name in names:
+        if TEMP_NAME_RE.match(name):
+            _discard(os.path.join(dest_folder, name))
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _write_replacing(dst, data):
+    """
+    Grava num arquivo novo e troca pelo destino. Nunca escreve dentro de um
+    'dst' existente: se ele for um hardlink do original (exportação anterior
+    com use_hardlink), escrever no lugar apagaria a foto original.
+    """
+    tmp = _temp_path(dst)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dst)
+    finally:
+        _discard(tmp) # Só sobra se algo falhou antes do replace
+
+def _copy_simple(src, dst, settings=None, cancel_event=None):
+    """Cópia sem edição: caminho rápido do kernel e, se ele falhar, shutil.copy2."""
     try:
-        shutil.copy2(src, dst)
+        if _copy_fast(src, dst, settings or {}, cancel_event):
+            return True
+        if cancel_event is not None and cancel_event.is_set():
+            return False
+    except OSError as e:
+        print(f"Cópia rápida falhou ({os.path.basename(src)}: {e}), usando cópia comum.")
+
+    tmp = _temp_path(dst)
+    try:
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
         return True
     except Exception as e:
+        _discard(tmp)
         print(f"Erro na cópia simples: {e}")
         return False
 
-def _process_imagemagick(src, dst, settings):
+def _copy_fast(src, dst, settings, cancel_event=None):
     """
-    Constrói e executa o comando do ImageMagick.
-    Funcionalidades: Full Auto, Resize, Qualidade.
+    Copia sem passar os bytes pelo Python, na ordem:
+      1. hardlink (opcional, mesmo volume): nenhum byte copiado;
+      2. reflink (FICLONE): o sistema de arquivos compartilha os blocos;
+      3. copy_file_range: cópia dentro do kernel (e offload no NVMe/NFS/SMB);
+      4. sendfile;
+      5. read/write com buffer grande.
+    O destino é pré-alocado antes de 3-5. Tudo é gravado num arquivo
+    provisório que depois substitui 'dst' (nunca escreve dentro de um 'dst'
+    existente, que pode ser hardlink do original). Retorna False se cancelado
+    no meio (o parcial é apagado) e levanta OSError se nada funcionar.
     """
-    executable = "magick" if IS_WINDOWS else "convert"
-    cmd = [executable, src]
-    
+    # 1. Hardlink: o "arquivo exportado" é o mesmo inode do original
+    if settings.get('use_hardlink'):
+        tmp = _temp_path(dst)
+        try:
+            if os.stat(src).st_dev == os.stat(os.path.dirname(dst) or ".").st_dev:
+                os.link(src, tmp)
+                os.replace(tmp, dst)
+                return True
+        except OSError:
+            _discard(tmp) # Volume/sistema sem suporte: copia normalmente
+
+    size = os.path.getsize(src)
+    tmp = _temp_path(dst)
+    try:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+
+            # 2. Reflink
+            if sys.platform.startswith("linux"):
+                try:
+                    import fcntl
+                    fcntl.ioctl(out_fd, FICLONE, in_fd)
+                    size = 0 # Nada mais a copiar
+                except OSError:
+                    pass
+
+            if size and hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(out_fd, 0, size)
+                except OSError:
+                    pass # tmpfs/FAT antigos etc.: só não pré-aloca
+
+            copied = 0
+            methods = []
+            if hasattr(os, "copy_file_range"):
+                methods.append(lambda n: os.copy_file_range(in_fd, out_fd, n, copied, copied))
+            if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+                methods.append(lambda n: os.sendfile(out_fd, in_fd, copied, n))
+
+            # 3 e 4: cada método continua de onde o anterior parou
+            for method in methods:
+                try:
+                    os.lseek(out_fd, copied, os.SEEK_SET)
+                    while copied < size:
+                        if cancel_event is not None and cancel_event.is_set():
+                            break
+                        sent = method(min(COPY_CHUNK, size - copied))
+                        if sent == 0:
+                            break
+                        copied += sent
+                    if copied >= size or (cancel_event is not None and cancel_event.is_set()):
+                        break
+                except OSError:
+                    continue # EXDEV, ENOSYS, EINVAL...: tenta o próximo
+
+            # 5. Buffer grande em espaço de usuário
+            if copied < size and not (cancel_event is not None and cancel_event.is_set()):
+                os.lseek(in_fd, copied, os.SEEK_SET)
+                os.lseek(out_fd, copied, os.SEEK_SET)
+                buf = bytearray(min(COPY_BUFFER, max(size - copied, 1)))
+                view = memoryview(buf)
+                while copied < size:
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    n = fsrc.readinto(buf)
+                    if not n:
+                        break
+                    fdst.write(view[:n])
+                    copied += n
+
+            cancelled = cancel_event is not None and cancel_event.is_set() and copied < size
+            if not cancelled and copied < size:
+                raise OSError(f"cópia incompleta ({copied}/{size} bytes)")
+            if not cancelled and size:
+                fdst.truncate(size) # Caso o arquivo tenha encolhido durante a cópia
+
+        if cancelled:
+            return False
+
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+        return True
+    finally:
+        _discard(tmp) # Parcial de um cancelamento ou erro
+
+def _resize_target(size, settings):
+    """Tamanho final com o resize ligado, ou None se a imagem já couber."""
+    if not (settings.get('use_resize') and settings.get('resize_value') and size.isValid()):
+        return None
+    val = settings['resize_value']
+    longest = max(size.width(), size.height())
+    if longest <= val: # Mesmo ">" do ImageMagick: só reduz
+        return None
+    ratio = val / longest
+    return QSize(max(1, round(size.width() * ratio)), max(1, round(size.height() * ratio)))
+
+def _process_native(src, dst, settings):
+    """
+    Resize + Full Auto + qualidade sem abrir processo externo (Qt + NumPy).
+    O JPEG é decodificado já reduzido (setScaledSize usa a redução por DCT do
+    libjpeg) para um tamanho um pouco acima do alvo, e o ajuste final é
+    feito com SmoothTransformation.
+    """
+    reader = QImageReader(src)
+    reader.setAutoTransform(True)
+    stored = reader.size() # Tamanho gravado (antes da rotação do EXIF)
+
+    target = _resize_target(stored, settings)
+
+    # Nada a reduzir, corrigir nem qualidade definida: re-encodar só perderia qualidade
+    if target is None and not settings.get('use_quality') and not settings.get('full_auto'):
+        return _copy_simple(src, dst, settings)
+
+    if target is not None:
+        # Maior redução por potência de 2 que ainda fica >= alvo (o resto é suavizado abaixo)
+        factor = 1
+        while (stored.width() // (factor * 2) >= target.width()
+               and stored.height() // (factor * 2) >= target.height()):
+            factor *= 2
+        if factor > 1:
+            reader.setScaledSize(QSize(stored.width() // factor, stored.height() // factor))
+
+    with span("export.decode"):
+        img = reader.read()
+    if img.isNull():
+        print(f"Erro motor nativo ({os.path.basename(src)}): {reader.errorString()}")
+        return False
+
+    # A imagem já pode ter sido girada pelo autoTransform
+    bound = max(target.width(), target.height()) if target is not None else None
+    return _finish_native(src, img, dst, settings, bound)
+
+def _encode_decoded(src, img, dst, settings):
+    """
+    Exporta a partir de uma imagem que a UI já tinha decodificado (preview ou
+    zoom, com o EXIF já aplicado), sem decodificar o original de novo.
+    Do original só lê o cabeçalho, para o tamanho final sair idêntico ao
+    de _process_native (o preview tem arredondamentos próprios).
+    Retorna (sucesso, da_memória): da_memória é False quando caiu no disco.
+    """
+    reader = QImageReader(src)
+    size = reader.size()
+    if reader.transformation() & QImageIOHandler.TransformationRotate90:
+        size = size.transposed()
+    target = _resize_target(size, settings)
+
+    # Original menor que o alvo, ou imagem da memória pequena demais: vai pelo disco
+    if (target is None or img is None or img.isNull()
+            or img.width() < target.width() or img.height() < target.height()):
+        return _process_native(src, dst, settings), False
+
+    with span("export.scale"):
+        img = img.scaled(target, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    return _finish_native(src, img, dst, settings), True
+
+def _finish_native(src, img, dst, settings, bound=None):
+    """
+    Reduz até 'bound' (lado maior), aplica o Full Auto e grava. Num JPEG, o
+    EXIF do original vai junto (como no convert, que só o tira com -strip) e,
+    sem qualidade definida, usa a estimada do original.
+    """
+    if bound and max(img.width(), img.height()) > bound:
+        with span("export.scale"):
+            img = img.scaled(bound, bound, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    # Full Auto depois do resize: as estatísticas são as mesmas e há bem menos pixels
+    if settings.get('full_auto'):
+        with span("export.full_auto"):
+            img = apply_full_auto(img)
+
+    # Codifica na memória para encaixar o EXIF antes de ir para o disco
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    writer = QImageWriter(buffer, os.path.splitext(dst)[1][1:].lower().encode())
+    is_jpeg = dst.lower().endswith(JPEG_EXTENSIONS)
+    if settings.get('use_quality'):
+        writer.setQuality(settings['quality_value'])
+    elif is_jpeg:
+        writer.setQuality(estimate_jpeg_quality(src) or DEFAULT_JPEG_QUALITY)
+    with span("export.encode"):
+        written = writer.write(img)
+    buffer.close()
+    if not written:
+        print(f"Erro motor nativo ({os.path.basename(dst)}): {writer.errorString()}")
+        return False
+
+    output = data.data()
+    if is_jpeg:
+        exif = exif_for_export(src, img.size())
+        if exif:
+            output = insert_exif(output, exif)
+    _write_replacing(dst, output)
+    return True
+
+def _magick_operations(settings):
+    """Operações do ImageMagick para estas configurações (sem entrada/saída)."""
+    ops = []
+
     # --- 1. FULL AUTO (Correção Geral) ---
     if settings.get('full_auto'):
         # O combo que validamos e funcionou
-        cmd.append("-auto-gamma")
-        cmd.extend(["-contrast-stretch", "0.1%x0.1%"])
-        cmd.extend(["-modulate", "100,110"])
-        #cmd.extend(["-unsharp", "0x0.75+0.75+0.008"])
+        ops.append("-auto-gamma")
+        ops.extend(["-contrast-stretch", "0.1%x0.1%"])
+        ops.extend(["-modulate", "100,110"])
+        #ops.extend(["-unsharp", "0x0.75+0.75+0.008"])
     
     # (Removemos o 'else' com os controles manuais que não funcionam bem)
 
     # --- 2. REDIMENSIONAR ---
     if settings.get('use_resize') and settings.get('resize_value'):
         val = settings['resize_value']
-        cmd.extend(["-resize", f"{val}x{val}>"]) 
+        ops.extend(["-resize", f"{val}x{val}>"]) 
 
     # --- 3. QUALIDADE (JPG) ---
     if settings.get('use_quality'):
         val = settings['quality_value']
-        cmd.extend(["-quality", str(val)])
+        ops.extend(["-quality", str(val)])
 
-    cmd.append(dst)
-    
+    return ops
+
+def _magick_run_params(settings):
     # Parâmetros de execução (aplica a flag no Windows para evitar o console piscando)
     run_params = {}
     if IS_WINDOWS:
@@ -75,14 +740,104 @@ def _process_imagemagick(src, dst, settings):
         CREATE_NO_WINDOW = 0x08000000
         run_params['creationflags'] = CREATE_NO_WINDOW
     
+    if settings.get('magick_thread_limit'):
+        run_params['env'] = dict(os.environ, MAGICK_THREAD_LIMIT=str(settings['magick_thread_limit']))
+    return run_params
+
+def _run_cancellable(cmd, run_params, cancel_event):
+    """
+    Roda o comando e retorna (returncode, stderr). Se 'cancel_event' disparar
+    no meio, mata o processo e retorna None.
+    """
+    # Executa o comando, aplicando as flags de criação (apenas no Windows)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **run_params)
+    while True:
+        try:
+            _, stderr = proc.communicate(timeout=0.2)
+            return proc.returncode, stderr.decode('utf-8', errors='ignore')
+        except subprocess.TimeoutExpired:
+            if cancel_event is not None and cancel_event.is_set():
+                proc.kill()
+                proc.communicate()
+                return None
+
+def _process_imagemagick(src, dst, settings, cancel_event=None):
+    """
+    Constrói e executa o comando do ImageMagick.
+    Funcionalidades: Full Auto, Resize, Qualidade.
+    """
+    executable = "magick" if IS_WINDOWS else "convert"
+    # Grava num arquivo provisório e troca: o convert truncaria um 'dst' que seja hardlink
+    # do original. O provisório não tem extensão de imagem, o formato vai explícito ("JPG:caminho")
+    tmp = _temp_path(dst)
+    output_format = os.path.splitext(dst)[1][1:].upper()
+    cmd = [executable, src] + _magick_operations(settings) + [f"{output_format}:{tmp}" if output_format else tmp]
+
     try:
-        # Executa o comando, aplicando as flags de criação (apenas no Windows)
-        subprocess.run(cmd, check=True, capture_output=True, **run_params)
+        result = _run_cancellable(cmd, _magick_run_params(settings), cancel_event)
+        if result is None:
+            return False # Cancelado: o parcial é apagado abaixo
+
+        returncode, stderr = result
+        if returncode != 0:
+            print(f"Erro ImageMagick: {stderr}")
+            return False
+        os.replace(tmp, dst)
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"Erro ImageMagick: {e.stderr.decode('utf-8', errors='ignore')}")
-        return False
     except FileNotFoundError:
         print(f"ERRO: ImageMagick ({executable}) não encontrado.")
         return False
-    
\ No newline at end of file
+    finally:
+        _discard(tmp)
+
+def export_magick_batch(paths, dest_folder, settings, cancel_event=None):
+    """
+    Processa vários arquivos com as mesmas configurações numa única chamada
+    do mogrify (-path grava no destino com o mesmo nome, como export_file).
+    Assim a inicialização do ImageMagick (config, delegates) é paga uma vez
+    por lote. Retorna [(caminho, sucesso)], com None para os cancelados.
+    """
+    outputs = {path: os.path.join(dest_folder, os.path.basename(path)) for path in paths}
+
+    # O mogrify grava por cima, no lugar: nunca na pasta de origem, e as saídas
+    # antigas (que podem ser hardlinks do original) saem antes em vez de truncadas
+    refused = [path for path, dst in outputs.items() if _is_source(path, dst)]
+    for path in refused:
+        print(f"❌ {os.path.basename(path)}: o destino é o próprio arquivo original, não exportado.")
+        del outputs[path]
+    if not outputs:
+        return [(path, False) for path in paths]
+    for dst in outputs.values():
+        _discard(dst)
+
+    cmd = (["magick", "mogrify"] if IS_WINDOWS else ["mogrify"])
+    cmd += ["-path", dest_folder] + _magick_operations(settings) + list(outputs)
+    started = time.time()
+
+    try:
+        with span("export.mogrify_batch", files=len(paths)):
+            result = _run_cancellable(cmd, _magick_run_params(settings), cancel_event)
+    except FileNotFoundError:
+        print(f"ERRO: ImageMagick ({cmd[0]}) não encontrado.")
+        return [(path, False) for path in paths]
+
+    if result is None:
+        # Cancelado: não dá para saber qual saída ficou pela metade, apaga o lote
+        for dst in outputs.values():
+            _discard(dst)
+        return [(path, None) for path in outputs] + [(path, False) for path in refused]
+
+    returncode, stderr = result
+    # O mogrify segue para o próximo arquivo quando um falha: confere saída por saída
+    results = [(path, False) for path in refused]
+    for path, dst in outputs.items():
+        try:
+            ok = os.path.getsize(dst) > 0 and os.path.getmtime(dst) >= started - 1
+        except OSError:
+            ok = False
+        if not ok:
+            name = os.path.basename(path)
+            lines = [line for line in stderr.splitlines() if name in line]
+            print(f"Erro ImageMagick ({name}): {' '.join(lines) or stderr.strip() or f'código {returncode}'}")
+        results.append((path, ok))
+    return results
@@ -0,0 +1,353 @@
+import os
+from bisect import bisect_left
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle
+from PySide6.QtCore import Qt, QAbstractListModel, QAbstractProxyModel, QModelIndex, QSize, QRect, QRectF, Signal
+from PySide6.QtGui import QColor, QPainter, QPen, QFont, QFontMetrics, QPixmap
+
+PATH_ROLE = Qt.UserRole
+BADGE_SIZE = 24 # Diâmetro do selo de nota na fita (px lógicos)
+
+def render_badge(rating, size=BADGE_SIZE, device_pixel_ratio=1.0):
+    """Selo amarelo com a nota, pintado uma vez num QPixmap transparente."""
+    pixmap = QPixmap(round(size * device_pixel_ratio), round(size * device_pixel_ratio))
+    pixmap.setDevicePixelRatio(device_pixel_ratio)
+    pixmap.fill(Qt.transparent)
+
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    rect = QRect(0, 0, size, size)
+
+    # Círculo Amarelo
+    painter.setBrush(QColor("#f1c40f"))
+    painter.setPen(Qt.NoPen)
+    painter.drawEllipse(rect)
+
+    # Número (fonte proporcional ao selo: 12pt para 30px)
+    painter.setPen(QColor("#000000"))
+    painter.setFont(QFont("Arial", max(6, size * 12 // 30), QFont.Bold))
+    painter.drawText(rect, Qt.AlignCenter, str(rating))
+
+    painter.end()
+    return pixmap
+
+class FilmstripModel(QAbstractListModel):
+    """
+    Uma linha por arquivo da pasta, desde o início. Os pixels não ficam no
+    modelo: a thumbnail é buscada no cache compartilhado na hora de pintar,
+    e quando falta o modelo pede ao loader (thumbnail_requested).
+    """
+    thumbnail_requested = Signal(str)
+
+    def __init__(self, thumbnails_cache, selector, parent=None):
+        super().__init__(parent)
+        self.thumbnails_cache = thumbnails_cache
+        self.selector = selector
+        self._paths = []
+        self._rows = {}         # {caminho: linha}
+        self._requested = set() # Pedidos em aberto (evita pedir a cada repaint)
+
+    # --- DADOS ---
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self._paths = list(paths)
+        self._rows = {path: row for row, path in enumerate(self._paths)}
+        self._requested.clear()
+        self.endResetModel()
+
+    def append_paths(self, paths):
+        if not paths:
+            return
+        first = len(self._paths)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        for path in paths:
+            self._rows[path] = len(self._paths)
+            self._paths.append(path)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._paths):
+            return None
+        path = self._paths[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == PATH_ROLE:
+            return path
+        return None
+
+    def path_at(self, row):
+        return self._paths[row] if 0 <= row < len(self._paths) else None
+
+    def row_of(self, path):
+        return self._rows.get(path, -1)
+
+    # --- PIXELS (sob demanda) ---
+
+    def thumbnail_for(self, row):
+        """Thumbnail limpa do cache, ou None (e pede ao loader)."""
+        path = self._paths[row]
+        pixmap = self.thumbnails_cache.get(path)
+        if pixmap is None and path not in self._requested:
+            self._requested.add(path)
+            self.thumbnail_requested.emit(path)
+        return pixmap
+
+    def refresh_path(self, path):
+        """Thumbnail nova ou nota alterada: repinta só aquela linha."""
+        self._requested.discard(path)
+        row = self._rows.get(path)
+        if row is None:
+            return
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx)
+
+class RatingFilterProxyModel(QAbstractProxyModel):
+    """
+    Filtro de notas da fita. Sem filtro ativo o mapeamento é identidade
+    (nada é guardado por linha). Com filtro, guarda a lista ordenada das
+    linhas do FilmstripModel que aparecem e acha cada uma por bisect.
+    Uma nota alterada chega pelo dataChanged da linha (refresh_path) e só
+    aquela linha entra ou sai.
+
+    O custo do proxy é o do resultado, mas a QListView refaz o layout de todas
+    as linhas visíveis a cada mudança de estrutura (chamando index() por linha,
+    em Python): desligar o filtro numa pasta grande continua custando a pasta.
+    """
+
+    def __init__(self, selector, parent=None):
+        super().__init__(parent)
+        self.selector = selector
+        self._filters = frozenset()
+        self._rows = None # None = sem filtro (identidade); senão linhas da origem, em ordem
+        # rowCount/index são chamados por linha no layout da QListView: contagem guardada
+        self._count = 0
+
+    def setSourceModel(self, model):
+        self.beginResetModel()
+        super().setSourceModel(model)
+        model.modelReset.connect(self._on_source_reset)
+        model.rowsInserted.connect(self._on_source_rows_inserted)
+        model.dataChanged.connect(self._on_source_data_changed)
+        self._rows = self._build_rows() if self._filters else None
+        self._sync_count()
+        self.endResetModel()
+
+    # --- FILTRO ---
+
+    def set_filters(self, ratings):
+        """
+        Conjunto de notas visíveis (vazio = tudo). Um reset só: a QListView
+        refaz o layout inteiro de qualquer jeito, e inserir/remover faixa por
+        faixa sairia mais caro.
+        """
+        ratings = frozenset(ratings)
+        if ratings == self._filters:
+            return
+        self.beginResetModel()
+        self._filters = ratings
+        self._rows = self._build_rows() if ratings else None
+        self._sync_count()
+        self.endResetModel()
+
+    def _sync_count(self):
+        source = self.sourceModel()
+        if self._rows is not None:
+            self._count = len(self._rows)
+        else:
+            self._count = source.rowCount() if source is not None else 0
+
+    def _accepts(self, path):
+        return self.selector.get_rating(path) in self._filters
+
+    def _build_rows(self):
+        source = self.sourceModel()
+        if source is None:
+            return []
+        if 0 in self._filters:
+            # "Sem nota" é o complemento do índice: aqui não tem como fugir da varredura
+            return [row for row in range(source.rowCount()) if self._accepts(source.path_at(row))]
+        rows = []
+        for rating in self._filters:
+            for path in self.selector.paths_with_rating(rating):
+                row = source.row_of(path)
+                if row >= 0: # Notas salvas de arquivos que não estão mais na pasta
+                    rows.append(row)
+        rows.sort()
+        return rows
+
+    def _find(self, source_row):
+        """Posição de source_row na lista filtrada e se ela está lá."""
+        pos = bisect_left(self._rows, source_row)
+        return pos, pos < len(self._rows) and self._rows[pos] == source_row
+
+    # --- ORIGEM ---
+
+    def _on_source_reset(self):
+        self.beginResetModel()
+        self._rows = self._build_rows() if self._filters else None
+        self._sync_count()
+        self.endResetModel()
+
+    def _on_source_rows_inserted(self, parent, first, last):
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+            self._sync_count()
+            self.endInsertRows()
+            return
+        source = self.sourceModel()
+        if first != source.rowCount() - (last - first + 1):
+            self._on_source_reset() # O FilmstripModel só acrescenta no fim; o resto recomeça
+            return
+        new_rows = [row for row in range(first, last + 1) if self._accepts(source.path_at(row))]
+        if new_rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+            self._rows.extend(new_rows)
+            self._sync_count()
+            self.endInsertRows()
+
+    def _on_source_data_changed(self, top_left, bottom_right, roles=()):
+        for source_row in range(top_left.row(), bottom_right.row() + 1):
+            if self._rows is None:
+                idx = self.index(source_row, 0)
+                self.dataChanged.emit(idx, idx, roles)
+                continue
+            pos, present = self._find(source_row)
+            wanted = self._accepts(self.sourceModel().path_at(source_row))
+            if present and not wanted:
+                self.beginRemoveRows(QModelIndex(), pos, pos)
+                del self._rows[pos]
+                self._sync_count()
+                self.endRemoveRows()
+            elif wanted and not present:
+                self.beginInsertRows(QModelIndex(), pos, pos)
+                self._rows.insert(pos, source_row)
+                self._sync_count()
+                self.endInsertRows()
+            elif present:
+                idx = self.index(pos, 0)
+                self.dataChanged.emit(idx, idx, roles)
+
+    # --- MAPEAMENTO ---
+
+    def source_row(self, row):
+        return row if self._rows is None else self._rows[row]
+
+    def row_of(self, path):
+        """Linha visível de um caminho, ou -1 se não existir/estiver filtrado."""
+        source_row = self.sourceModel().row_of(path)
+        if source_row < 0 or self._rows is None:
+            return source_row
+        pos, present = self._find(source_row)
+        return pos if present else -1
+
+    def nearest_row(self, path):
+        """Linha visível mais próxima de um caminho (útil quando ele saiu do filtro)."""
+        count = self.rowCount()
+        source_row = self.sourceModel().row_of(path)
+        if count == 0 or source_row < 0:
+            return -1
+        if self._rows is None:
+            return source_row
+        return min(bisect_left(self._rows, source_row), count - 1)
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid() or self.sourceModel() is None:
+            return QModelIndex()
+        return self.sourceModel().index(self.source_row(proxy_index.row()), 0)
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        if self._rows is None:
+            return self.index(source_index.row(), 0)
+        pos, present = self._find(source_index.row())
+        return self.index(pos, 0) if present else QModelIndex()
+
+    def index(self, row, column=0, parent=QModelIndex()):
+        if column or not 0 <= row < self._count or parent.isValid():
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def thumbnail_for(self, row):
+        return self.sourceModel().thumbnail_for(self.source_row(row))
+
+class FilmstripDelegate(QStyledItemDelegate):
+    """Pinta thumbnail (ou placeholder), nome do arquivo e selo de nota."""
+
+    ITEM_SIZE = QSize(150, 136)
+    ICON_SIZE = QSize(130, 104)
+
+    def __init__(self, selector, parent=None):
+        super().__init__(parent)
+        self.selector = selector
+        self._badges = {} # {(nota, devicePixelRatio): QPixmap}, no máximo 5 por tela
+
+    def badge(self, rating, device_pixel_ratio):
+        key = (rating, device_pixel_ratio)
+        sprite = self._badges.get(key)
+        if sprite is None:
+            sprite = self._badges[key] = render_badge(rating, BADGE_SIZE, device_pixel_ratio)
+        return sprite
+
+    def sizeHint(self, option, index):
+        return self.ITEM_SIZE
+
+    def paint(self, painter, option, index):
+        model = index.model()
+        path = index.data(PATH_ROLE)
+        rect = option.rect.adjusted(2, 2, -2, -2)
+
+        painter.save()
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+
+        # 1. Fundo de seleção (mesmo visual do antigo QListWidget::item:selected)
+        if option.state & QStyle.State_Selected:
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QPen(QColor("#3498db"), 2))
+            painter.setBrush(QColor("#2980b9"))
+            painter.drawRoundedRect(QRectF(rect), 5, 5)
+
+        # 2. Thumbnail ou placeholder
+        icon_area = QRect(rect.x() + (rect.width() - self.ICON_SIZE.width()) // 2,
+                          rect.y() + 4, self.ICON_SIZE.width(), self.ICON_SIZE.height())
+        pixmap = model.thumbnail_for(index.row())
+        if pixmap is not None and not pixmap.isNull():
+            size = pixmap.size().scaled(icon_area.size(), Qt.KeepAspectRatio)
+            target = QRect(icon_area.x() + (icon_area.width() - size.width()) // 2,
+                           icon_area.y() + (icon_area.height() - size.height()) // 2,
+                           size.width(), size.height())
+            painter.drawPixmap(target, pixmap)
+
+            # 3. Selo de nota: só um drawPixmap de um sprite já pronto
+            rating = self.selector.get_rating(path)
+            if rating > 0:
+                sprite = self.badge(rating, painter.device().devicePixelRatioF())
+                painter.drawPixmap(target.right() - BADGE_SIZE - 3, target.top() + 3, sprite)
+        else:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor("#3a3a3a"))
+            painter.drawRect(icon_area)
+            painter.setPen(QColor("#777"))
+            painter.drawText(icon_area, Qt.AlignCenter, "...")
+
+        # 4. Nome do arquivo
+        text_rect = QRect(rect.x() + 4, icon_area.bottom() + 2, rect.width() - 8,
+                          rect.bottom() - icon_area.bottom() - 2)
+        painter.setPen(QColor("#eeeeee"))
+        name = QFontMetrics(option.font).elidedText(index.data(Qt.DisplayRole), Qt.ElideMiddle, text_rect.width())
+        painter.drawText(text_rect, Qt.AlignHCenter | Qt.AlignVCenter, name)
+
+        painter.restore()
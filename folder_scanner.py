@@ -0,0 +1,68 @@
+import os
+import time
+from PySide6.QtCore import QThread, Signal
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.arw', '.cr2', '.nef', '.dng', '.bmp')
+
+class FolderScanner(QThread):
+    """
+    Lista a pasta em segundo plano com os.scandir e entrega os arquivos em
+    lotes, junto com o stat (tamanho, mtime) que o scandir já obteve.
+    Assim as primeiras thumbnails aparecem antes da listagem terminar.
+    """
+    batch_found = Signal(object) # [(caminho, os.stat_result)]
+    scan_finished = Signal(int)  # Total encontrado
+
+    def __init__(self, folder, extensions=IMAGE_EXTENSIONS):
+        super().__init__()
+        self.folder = folder
+        self.extensions = extensions
+        self.cancelled = False
+
+        # O primeiro lote sai cedo (para a tela encher rápido); depois lotes maiores
+        self.first_batch_size = 64
+        self.batch_size = 512
+        self.batch_interval = 0.2 # Segundos máximos entre lotes
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        total = 0
+        batch = []
+        limit = self.first_batch_size
+        last_emit = time.monotonic()
+
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if self.cancelled:
+                        return
+                    if not entry.name.lower().endswith(self.extensions):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+
+                    batch.append((entry.path, st))
+                    now = time.monotonic()
+                    if len(batch) >= limit or now - last_emit >= self.batch_interval:
+                        batch.sort(key=lambda e: e[0])
+                        total += len(batch)
+                        self.batch_found.emit(batch)
+                        batch = []
+                        limit = self.batch_size
+                        last_emit = now
+        except OSError as e:
+            print(f"Erro ao listar {self.folder}: {e}")
+
+        if batch and not self.cancelled:
+            batch.sort(key=lambda e: e[0])
+            total += len(batch)
+            self.batch_found.emit(batch)
+
+        if not self.cancelled:
+            self.scan_finished.emit(total)
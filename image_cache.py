@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from PySide6.QtCore import QMutex
+from PySide6.QtGui import QPixmap, QImage
+
+# Divisão padrão do orçamento de RAM entre as camadas
+DEFAULT_TIER_SHARES = {
+    "thumbnails": 0.10,
+    "previews": 0.45,
+    "full": 0.20,        # Poucas imagens em resolução máxima (zoom)
+    "raw_sources": 0.15, # JPEG embutido de cada RAW, decodificado uma vez (ver min_items no loader)
+    "tiles": 0.10,       # Tiles da pirâmide do zoom já pintados
+}
+
+# Custo mínimo de uma entrada: as sem pixels (ex.: None de um RAW que falhou)
+# também ocupam memória e precisam poder sair do LRU
+ENTRY_MIN_BYTES = 4096
+
+def image_bytes(value):
+    """Bytes reais de pixels de um QPixmap/QImage (não a contagem de itens)."""
+    if isinstance(value, QImage):
+        return value.sizeInBytes()
+    if isinstance(value, QPixmap):
+        return value.width() * value.height() * max(value.depth(), 8) // 8
+    return 0
+
+class CacheTier:
+    """
+    LRU limitado por bytes, seguro para uso entre threads (loader + UI).
+    'min_items' entradas ficam mesmo acima do orçamento (uma imagem grande
+    sozinha nunca é despejada ao entrar).
+    """
+
+    def __init__(self, name, budget_bytes, min_items=1):
+        self.name = name
+        self.budget_bytes = budget_bytes
+        self.min_items = max(1, min_items)
+        self._entries = OrderedDict() # {chave: (valor, meta, bytes)}
+        self._bytes = 0
+        self.mutex = QMutex()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Busca e marca como usado recentemente. Conta hit/miss."""
+        self.mutex.lock()
+        try:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        finally:
+            self.mutex.unlock()
+
+    def peek(self, key):
+        """Busca sem mexer no LRU nem nos contadores (para consultas que não são uso real)."""
+        self.mutex.lock()
+        try:
+            entry = self._entries.get(key)
+            return entry[0] if entry else None
+        finally:
+            self.mutex.unlock()
+
+    def meta(self, key):
+        """Retorna o metadado guardado junto (ex.: tamanho alvo), sem mexer no LRU."""
+        self.mutex.lock()
+        try:
+            entry = self._entries.get(key)
+            return entry[1] if entry else None
+        finally:
+            self.mutex.unlock()
+
+    def put(self, key, value, meta=None):
+        size = max(image_bytes(value), ENTRY_MIN_BYTES)
+        self.mutex.lock()
+        try:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[2]
+            self._entries[key] = (value, meta, size)
+            self._bytes += size
+            self._evict()
+        finally:
+            self.mutex.unlock()
+
+    def remove(self, key):
+        self.mutex.lock()
+        try:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[2]
+        finally:
+            self.mutex.unlock()
+
+    def clear(self):
+        self.mutex.lock()
+        self._entries.clear()
+        self._bytes = 0
+        self.mutex.unlock()
+
+    def set_budget(self, budget_bytes):
+        self.mutex.lock()
+        self.budget_bytes = budget_bytes
+        self._evict()
+        self.mutex.unlock()
+
+    def set_min_items(self, count):
+        self.mutex.lock()
+        self.min_items = max(1, count)
+        self._evict()
+        self.mutex.unlock()
+
+    def __contains__(self, key):
+        self.mutex.lock()
+        try:
+            return key in self._entries
+        finally:
+            self.mutex.unlock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def used_bytes(self):
+        return self._bytes
+
+    def _evict(self):
+        """Remove os menos usados até caber no orçamento (chamado com o mutex travado)."""
+        # Nunca desce de min_items (o item que acabou de entrar sempre fica)
+        while self._bytes > self.budget_bytes and len(self._entries) > self.min_items:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "itens": len(self._entries),
+            "mb": self._bytes / (1024 * 1024),
+            "orcamento_mb": self.budget_bytes / (1024 * 1024),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+class ImageCache:
+    """
+    Cache único de imagens decodificadas, compartilhado pelo ImageLoaderWorker
+    (que grava) e pelo CullingApp (que lê). O orçamento total em MB é dividido
+    entre as camadas.
+    """
+
+    def __init__(self, budget_mb=512, shares=None):
+        self.shares = dict(shares or DEFAULT_TIER_SHARES)
+        self.budget_mb = budget_mb
+        self.tiers = {
+            name: CacheTier(name, int(budget_mb * share * 1024 * 1024))
+            for name, share in self.shares.items()
+        }
+
+    def tier(self, name):
+        return self.tiers[name]
+
+    @property
+    def thumbnails(self):
+        return self.tiers["thumbnails"]
+
+    @property
+    def previews(self):
+        return self.tiers["previews"]
+
+    @property
+    def full(self):
+        return self.tiers["full"]
+
+    @property
+    def raw_sources(self):
+        return self.tiers["raw_sources"]
+
+    @property
+    def tiles(self):
+        return self.tiers["tiles"]
+
+    def set_budget(self, budget_mb):
+        self.budget_mb = budget_mb
+        for name, tier in self.tiers.items():
+            tier.set_budget(int(budget_mb * self.shares[name] * 1024 * 1024))
+
+    def set_tier_budget(self, name, budget_mb):
+        """Sobrescreve o orçamento de uma camada específica."""
+        self.tiers[name].set_budget(int(budget_mb * 1024 * 1024))
+
+    def stats_text(self):
+        parts = []
+        for name, tier in self.tiers.items():
+            st = tier.stats()
+            parts.append(
+                f"{name}: {st['itens']} itens, {st['mb']:.0f}/{st['orcamento_mb']:.0f}MB, "
+                f"hit {st['hit_rate']:.0%}, {st['evictions']} evicções"
+            )
+        return " | ".join(parts)
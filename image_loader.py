@@ -1,15 +1,58 @@
-import os
+import heapq
+import itertools
 import rawpy
+from collections import namedtuple
+from disk_cache import DiskCache
+from exif_reader import load_exif_thumbnail, find_embedded_jpegs, read_embedded_jpeg
+from image_cache import ImageCache
+from prefetcher import NavigationPrefetcher
+from tracing import span, tracer
 from PySide6.QtCore import QThread, Signal, QObject, QSize, QMutex, QWaitCondition, Qt
-from PySide6.QtGui import QImageReader, QPixmap, QImage
+from PySide6.QtGui import QImageReader, QImageIOHandler, QPixmap, QImage
+
+RAW_EXTENSIONS = ('.arw', '.cr2', '.nef', '.dng', '.orf')
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+# Abaixo disso o JPEG achado pelo parser é só a thumbnail; deixa o LibRaw procurar um maior
+MIN_RAW_PREVIEW_SIDE = 640
+
+# Metadado das entradas da camada de previews. from_original=False quando veio
+# do DiskCache (JPEG re-encodado): não serve de origem para a exportação
+PreviewMeta = namedtuple("PreviewMeta", "width height from_original")
+
+# Prioridades da fila de decodificação (menor número = mais urgente)
+PRIORITY_FULL = -1           # Zoom em resolução máxima pedido pelo usuário
+PRIORITY_PREVIEW = 0         # Preview da foto que o usuário está olhando
+PRIORITY_PREFETCH = 1        # Previews das próximas fotos
+PRIORITY_VISIBLE_THUMB = 2   # Thumbnails próximas do cursor (visíveis na fita)
+PRIORITY_WINDOW_THUMB = 3    # Resto da janela deslizante
+
+def default_worker_count():
+    """Deixa um núcleo livre para a interface, com teto para não saturar o disco."""
+    return max(1, min(8, QThread.idealThreadCount() - 1))
 
 class LoaderSignals(QObject):
     # Sinais para comunicar com a interface (Main Thread)
     thumbnail_loaded = Signal(str, QPixmap)  # Caminho, Imagem
     preview_loaded = Signal(str, QPixmap)    # Caminho, Imagem
-    
+    full_resolution_loaded = Signal(str, QImage)  # Caminho, Imagem (Zoom, cortada em tiles na UI)
+
+class DecodeWorker(QThread):
+    """Uma das N threads do pool. Só consome jobs da fila do ImageLoaderWorker."""
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+        self.retired = False # Marcado quando o pool diminui
+
+    def run(self):
+        while True:
+            job = self.loader._next_job(self)
+            if job is None:
+                break
+            self.loader._execute_job(job)
+
 class ImageLoaderWorker(QThread):
-    def __init__(self):
+    def __init__(self, worker_count=None, prefetch_ahead=3, cache=None):
         super().__init__()
         self.signals = LoaderSignals()
         
@@ -19,34 +62,94 @@ class ImageLoaderWorker(QThread):
         
         # Buffer (Janela Deslizante)
         self.buffer_range = (15, 30) # (Atrás, Frente)
-        self.loaded_thumbs = set()   # Rastrea o que já carregamos para não repetir
+        self.visible_radius = 6      # Thumbs a essa distância do cursor ganham prioridade
+        self.failed_thumbs = set()   # Arquivos que não deu para ler (não insiste)
+        self.in_flight_thumbs = set() # Thumbs sendo decodificadas agora
+
+        # Prefetch de previews guiado pela direção/velocidade da navegação
+        self.prefetcher = NavigationPrefetcher(ahead=prefetch_ahead)
+        self.in_flight_previews = set()   # {(caminho, w, h)} em decodificação
+
+        # Cache de RAM compartilhado com a UI (orçamento em bytes por camada)
+        self.cache = cache or ImageCache()
+        self._sync_prefetch_budget()
+
+        # Cache persistente em disco (sobrevive entre execuções)
+        self.disk_cache = DiskCache()
+
+        # Estágio de decodificação compartilhado: o JPEG embutido de cada RAW é
+        # decodificado uma única vez e serve thumbnail, preview e zoom.
+        # Fica numa camada do ImageCache: {caminho: QImage ou None}
+        self.raw_sources = self.cache.raw_sources
+        self._sync_raw_sources_window()
         
         # Estado
         self.all_paths = []
+        self.file_stats = {}   # {caminho: os.stat_result} vindos do scandir (evita stat repetido)
         self.current_index = 0
         self.running = True
         self.needs_update = False
+
+        # Fila de prioridade + token de geração: toda mudança de posição
+        # incrementa a geração e os jobs antigos são descartados sem decodificar.
+        self.jobs = []                 # heap de (prioridade, seq, geração, tipo, caminho)
+        self.job_seq = itertools.count()
+        self.generation = 0
+        self.zoom_token = 0            # Cancela o zoom pendente ao sair do zoom/trocar de foto
+        self.worker_count = worker_count or default_worker_count()
+        self.workers = []
         
         # Sincronização
         self.mutex = QMutex()
-        self.condition = QWaitCondition()
+        self.condition = QWaitCondition()      # Acorda o agendador
+        self.jobs_available = QWaitCondition() # Acorda as threads do pool
 
-    def set_paths(self, paths):
-        """Recebe a lista bruta de arquivos ao abrir a pasta."""
+    def set_paths(self, paths, stats=None, keep_loaded=False):
+        """
+        Recebe a lista de arquivos ao abrir a pasta. Com keep_loaded=True (a
+        mesma pasta reordenada), mantém o que já foi carregado e a foto atual.
+        """
         self.mutex.lock()
-        self.all_paths = paths
-        self.loaded_thumbs.clear()
-        self.current_index = 0
-        self.needs_update = True
-        self.condition.wakeOne()
+        current_path = None
+        if keep_loaded and 0 <= self.current_index < len(self.all_paths):
+            current_path = self.all_paths[self.current_index]
+
+        self.all_paths = list(paths)
+        if stats is not None:
+            self.file_stats = dict(stats)
+        if keep_loaded:
+            self.current_index = self._index_of(current_path)
+        else:
+            self.failed_thumbs.clear()
+            self.prefetcher.reset()
+            self.current_index = 0
+        self._invalidate_jobs()
         self.mutex.unlock()
 
+    def append_paths(self, paths, stats=None):
+        """Acrescenta um lote vindo do FolderScanner enquanto a pasta ainda está sendo listada."""
+        self.mutex.lock()
+        # Lista nova (não 'extend'): o agendador pode estar usando a anterior
+        self.all_paths = self.all_paths + list(paths)
+        if stats:
+            self.file_stats.update(stats)
+        self._invalidate_jobs()
+        self.mutex.unlock()
+
+    def _index_of(self, path):
+        if path is None:
+            return 0
+        try:
+            return self.all_paths.index(path)
+        except ValueError:
+            return 0
+
     def update_position(self, index):
         """O Main avisa: 'O usuário pulou para a foto X'."""
         self.mutex.lock()
         self.current_index = index
-        self.needs_update = True
-        self.condition.wakeOne()
+        self.prefetcher.record(index)
+        self._invalidate_jobs()
         self.mutex.unlock()
 
     def set_max_preview_size(self, size: QSize):
@@ -59,72 +162,358 @@ class ImageLoaderWorker(QThread):
 
         self.preview_size = size
         # Dispara uma atualização para recarregar o preview atual, se necessário
+        self._invalidate_jobs()
+        self.mutex.unlock()
+
+    def set_worker_count(self, count):
+        """Redimensiona o pool de decodificação em tempo real."""
+        count = max(1, int(count))
+        self.mutex.lock()
+        self.worker_count = count
+        running = self.running and self.isRunning()
+        self.mutex.unlock()
+        if running:
+            self._resize_pool()
+
+    def set_prefetch_ahead(self, count):
+        """Quantidade mínima de previews pré-carregados na direção da navegação."""
+        self.mutex.lock()
+        self.prefetcher.ahead = max(1, int(count))
+        self._sync_raw_sources_window()
+        self._invalidate_jobs()
+        self.mutex.unlock()
+
+    def _sync_raw_sources_window(self):
+        """
+        Um JPEG embutido de 24 MP tem ~96 MB e pode sozinho passar da camada:
+        a foto atual e as do prefetch ficam mesmo acima do orçamento, senão
+        cada origem seria despejada logo ao entrar (e o zoom decodificaria de novo).
+        """
+        self.raw_sources.set_min_items(self.prefetcher.ahead + 1)
+
+    def _sync_prefetch_budget(self):
+        """O prefetch pode ocupar até metade da camada de previews (o resto fica para o histórico)."""
+        self.prefetcher.budget_bytes = self.cache.previews.budget_bytes // 2
+
+    def set_cache_budget(self, budget_mb):
+        self.cache.set_budget(budget_mb)
+        self.mutex.lock()
+        self._sync_prefetch_budget()
+        self._invalidate_jobs()
+        self.mutex.unlock()
+
+    def request_thumbnail(self, path):
+        """
+        A fita pediu uma thumbnail que está visível mas não está no cache.
+        Esses pedidos não têm geração: sobrevivem às mudanças de posição.
+        """
+        self.mutex.lock()
+        if self._thumb_needed(path):
+            heapq.heappush(self.jobs, (PRIORITY_VISIBLE_THUMB, next(self.job_seq), None, "thumb", path))
+            self.jobs_available.wakeOne()
+        self.mutex.unlock()
+
+    def request_full_resolution(self, path):
+        """Pede o zoom em resolução máxima em segundo plano (resultado via full_resolution_loaded)."""
+        self.mutex.lock()
+        self.zoom_token += 1
+        heapq.heappush(self.jobs, (PRIORITY_FULL, next(self.job_seq), self.zoom_token, "full", path))
+        self.jobs_available.wakeOne()
+        self.mutex.unlock()
+
+    def cancel_full_resolution(self):
+        """Descarta o pedido de zoom pendente (se já estiver decodificando, o resultado é ignorado)."""
+        self.mutex.lock()
+        self.zoom_token += 1
+        self.mutex.unlock()
+
+    def _invalidate_jobs(self):
+        """Nova geração: jobs antigos viram lixo (chamado com o mutex travado)."""
+        self.generation += 1
+        # Mantém só os pedidos da fita (geração None) e o zoom pendente
+        self.jobs = [job for job in self.jobs if job[2] is None or job[3] == "full"]
+        heapq.heapify(self.jobs)
         self.needs_update = True
         self.condition.wakeOne()
-        self.mutex.unlock()
 
     def stop(self):
+        self.mutex.lock()
         self.running = False
-        self.condition.wakeOne()
+        self.jobs.clear()
+        self.condition.wakeAll()
+        self.jobs_available.wakeAll()
+        self.mutex.unlock()
+        for worker in self.workers:
+            worker.wait()
+        self.workers = []
         self.wait()
 
+    # --- POOL DE DECODIFICAÇÃO ---
+
+    def _resize_pool(self):
+        self.mutex.lock()
+        # Remove as threads que já terminaram (aposentadas)
+        self.workers = [w for w in self.workers if not (w.retired and w.isFinished())]
+        active = [w for w in self.workers if not w.retired]
+
+        new_workers = []
+        if len(active) < self.worker_count:
+            for _ in range(self.worker_count - len(active)):
+                worker = DecodeWorker(self)
+                self.workers.append(worker)
+                new_workers.append(worker)
+        else:
+            for worker in active[self.worker_count:]:
+                worker.retired = True
+            self.jobs_available.wakeAll()
+        self.mutex.unlock()
+
+        for worker in new_workers:
+            worker.start()
+
+    def _next_job(self, worker):
+        """
+        Entrega o job mais urgente da geração atual (bloqueia se a fila estiver
+        vazia), com a chave que marcou o preview como em decodificação no fim
+        (None para os outros tipos): o tamanho do preview pode mudar até o job acabar.
+        """
+        self.mutex.lock()
+        try:
+            while True:
+                if not self.running or worker.retired:
+                    return None
+                if not self.jobs:
+                    self.jobs_available.wait(self.mutex)
+                    continue
+
+                job = heapq.heappop(self.jobs)
+                priority, _, generation, kind, path = job
+                if kind == "full":
+                    if generation != self.zoom_token:
+                        continue # Zoom cancelado
+                    return job + (None,)
+                if generation is not None and generation != self.generation:
+                    continue # Job velho: o cursor já mudou
+
+                if kind == "thumb":
+                    if not self._thumb_needed(path):
+                        continue
+                    self.in_flight_thumbs.add(path)
+                    return job + (None,)
+
+                preview_key = self._preview_key(path)
+                if preview_key in self.in_flight_previews:
+                    continue
+                if self._has_cached_preview(path):
+                    continue # Já está na RAM no tamanho certo
+                self.in_flight_previews.add(preview_key)
+                return job + (preview_key,)
+        finally:
+            self.mutex.unlock()
+
+    def _execute_job(self, job):
+        priority, _, generation, kind, path, preview_key = job
+        with span(f"job.{kind}", path=path):
+            self._run_job(kind, generation, path, preview_key)
+
+    def _run_job(self, kind, generation, path, preview_key=None):
+        if kind == "full":
+            img = self._load_full_image(path)
+            if img is None:
+                return
+            # Fica como QImage: a UI corta em tiles sob demanda em vez de
+            # converter tudo para um QPixmap gigante
+            # Guarda mesmo se cancelado: apertar Z de novo na mesma foto sai de graça
+            self.cache.full.put(path, img)
+            self.mutex.lock()
+            still_wanted = (generation == self.zoom_token)
+            self.mutex.unlock()
+            if still_wanted:
+                self.signals.full_resolution_loaded.emit(path, img)
+        elif kind == "preview":
+            try:
+                self._load_preview(path)
+            finally:
+                self.mutex.lock()
+                self.in_flight_previews.discard(preview_key)
+                self.mutex.unlock()
+            # Aproveita a mesma decodificação para gerar a thumbnail logo em seguida
+            self._load_thumbnail_once(path)
+        else:
+            try:
+                self._load_thumbnail(path)
+            finally:
+                self._finish_thumbnail(path)
+
+    def _thumb_needed(self, path):
+        """O cache é a fonte da verdade: thumb despejada volta a ser carregada (mutex travado)."""
+        return (path not in self.in_flight_thumbs
+                and path not in self.failed_thumbs
+                and path not in self.cache.thumbnails)
+
+    def _finish_thumbnail(self, path):
+        self.mutex.lock()
+        self.in_flight_thumbs.discard(path)
+        if path not in self.cache.thumbnails:
+            self.failed_thumbs.add(path)
+        self.mutex.unlock()
+
+    def _preview_key(self, path):
+        return (path, self.preview_size.width(), self.preview_size.height())
+
+    def _has_cached_preview(self, path):
+        meta = self.cache.previews.meta(path)
+        return meta is not None and (meta.width, meta.height) == (self.preview_size.width(), self.preview_size.height())
+
+    def _deliver_preview(self, path, img, preview_size, from_original=True):
+        """Guarda no cache compartilhado e avisa a UI."""
+        with span("qt.pixmap_from_image"):
+            pixmap = QPixmap.fromImage(img)
+        meta = PreviewMeta(preview_size.width(), preview_size.height(), from_original)
+        self.cache.previews.put(path, pixmap, meta)
+        tracer.begin(("preview", path)) # Fecha no slot da interface (tempo na fila de eventos)
+        self.signals.preview_loaded.emit(path, pixmap)
+
+    def _deliver_thumbnail(self, path, img):
+        with span("qt.pixmap_from_image"):
+            pixmap = QPixmap.fromImage(img)
+        self.cache.thumbnails.put(path, pixmap)
+        tracer.begin(("thumb", path))
+        self.signals.thumbnail_loaded.emit(path, pixmap)
+
+    def _push_job(self, priority, kind, path):
+        """Chamado com o mutex travado."""
+        heapq.heappush(self.jobs, (priority, next(self.job_seq), self.generation, kind, path))
+
     def run(self):
-        """O Loop Infinito Inteligente."""
-        while self.running:
+        """O Agendador: transforma a posição atual em jobs priorizados para o pool."""
+        self._resize_pool()
+
+        while True:
             self.mutex.lock()
             
             # Se não tem nada novo para fazer, dorme para economizar CPU
-            if not self.needs_update:
+            if self.running and not self.needs_update:
                 self.condition.wait(self.mutex)
             
             if not self.running:
                 self.mutex.unlock()
                 break
 
-            # Copia dados para trabalhar sem travar o mutex
+            self.needs_update = False
             index = self.current_index
             paths = self.all_paths
-            self.needs_update = False
+            if paths:
+                self._schedule(index, paths)
+                self.jobs_available.wakeAll()
             self.mutex.unlock()
 
-            if not paths:
+    def _schedule(self, index, paths):
+        """Monta a fila da geração atual (chamado com o mutex travado)."""
+        # --- ESTRATÉGIA DE PRIORIDADE (ALGORITMO) ---
+
+        # 1. Prioridade Máxima: O Preview da Imagem Atual (Para o usuário ver agora)
+        if 0 <= index < len(paths):
+            self._push_job(PRIORITY_PREVIEW, "preview", paths[index])
+
+        # 2. Prioridade Alta: Previews na direção da navegação (e um pouco para trás)
+        preview_bytes = self.preview_size.width() * self.preview_size.height() * 4
+        for i in self.prefetcher.plan(index, len(paths), preview_bytes):
+            self._push_job(PRIORITY_PREFETCH, "preview", paths[i])
+
+        # 3. Thumbnails da Janela Deslizante, das mais próximas do cursor para as mais longe
+        # Calcula a janela: [start ... index ... end]
+        start = max(0, index - self.buffer_range[0])
+        end = min(len(paths), index + self.buffer_range[1])
+
+        for i in sorted(range(start, end), key=lambda i: abs(i - index)):
+            path = paths[i]
+            if not self._thumb_needed(path):
                 continue
+            if abs(i - index) <= self.visible_radius:
+                self._push_job(PRIORITY_VISIBLE_THUMB, "thumb", path)
+            else:
+                self._push_job(PRIORITY_WINDOW_THUMB, "thumb", path)
 
-            # --- ESTRATÉGIA DE PRIORIDADE (ALGORITMO) ---
-            
-            # 1. Prioridade Máxima: O Preview da Imagem Atual (Para o usuário ver agora)
-            if 0 <= index < len(paths):
-                self._load_preview(paths[index])
-
-            # 2. Prioridade Alta: O Preview da Próxima Imagem (Preload)
-            if index + 1 < len(paths):
-                self._load_preview(paths[index + 1])
-
-            # 3. Prioridade Média: Thumbnails da Janela Deslizante
-            # Calcula a janela: [start ... index ... end]
-            start = max(0, index - self.buffer_range[0])
-            end = min(len(paths), index + self.buffer_range[1])
-
-            # Carrega thumbnails que faltam nessa janela
-            for i in range(start, end):
-                if not self.running: break
-                if self.needs_update: break # Usuário mudou rápido demais, aborta e recalcula!
-                
-                path = paths[i]
-                if path not in self.loaded_thumbs:
-                    self._load_thumbnail(path)
-                    self.loaded_thumbs.add(path)
+    def _load_thumbnail_once(self, path):
+        self.mutex.lock()
+        if not self._thumb_needed(path):
+            self.mutex.unlock()
+            return
+        self.in_flight_thumbs.add(path)
+        self.mutex.unlock()
+
+        try:
+            self._load_thumbnail(path)
+        finally:
+            self._finish_thumbnail(path)
+
+    def _is_raw(self, path):
+        return path.lower().endswith(RAW_EXTENSIONS)
+
+    def _get_raw_source(self, path):
+        """
+        Retorna o JPEG embutido já decodificado (QImage em tamanho original).
+        Todos os tamanhos (thumb, preview, zoom) saem desta mesma imagem,
+        então cada RAW é aberto e decodificado no máximo uma vez enquanto
+        estiver na camada raw_sources do cache.
+        """
+        img = self.raw_sources.get(path)
+        if img is not None or path in self.raw_sources:
+            return img
+
+        img = self._extract_raw_preview(path)
+        if img is not None and img.isNull():
+            img = None
+
+        # Guarda até falhas (None) para não reabrir um RAW que já sabemos que não tem JPEG
+        self.raw_sources.put(path, img)
+        return img
+
+    def _peek_raw_source(self, path):
+        """Retorna o RAW já decodificado se estiver no cache (sem decodificar)."""
+        return self.raw_sources.peek(path)
+
+    def _load_raw_thumbnail(self, path):
+        """
+        Thumbnail de RAW pelo menor JPEG embutido que ainda sirva para a fita,
+        decodificado já reduzido. Evita decodificar o preview grande só para a fita.
+        """
+        with span("io.raw_scan"):
+            jpegs = find_embedded_jpegs(path)
+        for jpeg in jpegs:
+            if jpeg.width >= self.thumb_size.width() * 0.75 or jpeg.height >= self.thumb_size.height() * 0.75:
+                scaled = self._calculate_aspect_ratio(QSize(jpeg.width, jpeg.height), self.thumb_size)
+                with span("decode.embedded_jpeg"):
+                    return read_embedded_jpeg(path, jpeg, scaled)
+        return None
 
     def _extract_raw_preview(self, path):
-        """Usa o rawpy para extrair o JPEG embutido sem processar o RAW."""
+        """
+        Extrai o maior JPEG embutido sem processar o RAW. Primeiro pelo parser
+        TIFF próprio (mmap, sem o custo de abrir o LibRaw); o rawpy fica como
+        reserva para containers que o parser não entende.
+        """
+        with span("io.raw_scan"):
+            jpegs = find_embedded_jpegs(path)
+        if jpegs and max(jpegs[-1].width, jpegs[-1].height) >= MIN_RAW_PREVIEW_SIDE:
+            with span("decode.embedded_jpeg"):
+                img = read_embedded_jpeg(path, jpegs[-1])
+            if img is not None:
+                return img
+
         try:
-            with rawpy.imread(path) as raw:
+            with span("rawpy.imread"):
+                raw = rawpy.imread(path)
+            with raw:
                 # Tenta extrair a thumbnail (geralmente é o preview Full HD embutido)
-                thumb = raw.extract_thumb()
+                with span("rawpy.extract_thumb"):
+                    thumb = raw.extract_thumb()
             
             # Converte os bytes extraídos direto para QImage
             if thumb.format == rawpy.ThumbFormat.JPEG:
-                img = QImage.fromData(thumb.data)
+                with span("decode.fromdata"):
+                    img = QImage.fromData(thumb.data)
                 return img
             return None
         except Exception as e:
@@ -134,30 +523,46 @@ class ImageLoaderWorker(QThread):
     def _load_preview(self, path):
         """Carrega a imagem 'grande' (Max 720px), suportando RAW e JPG."""
         try:
+            # 0. Já foi gerado em outra sessão? Serve direto do disco
+            preview_size = self.preview_size
+            cache_key = self.disk_cache.make_key(path, preview_size, "preview", self.file_stats.get(path))
+            with span("io.disk_cache_get"):
+                cached = self.disk_cache.get(cache_key)
+            if cached is not None:
+                self._deliver_preview(path, cached, preview_size, from_original=False)
+                return
+
             img = None
             # SE FOR RAW: Usa a técnica do Photo Mechanic (rawpy)
-            if path.lower().endswith(('.arw', '.cr2', '.nef', '.dng', '.orf')):
-                img = self._extract_raw_preview(path)
+            if self._is_raw(path):
+                img = self._get_raw_source(path)
                 
                 # Se conseguiu ler o RAW, redimensiona para o tamanho de preview
                 if img and not img.isNull():
-                    new_size = self._calculate_aspect_ratio(img.size(), self.preview_size)
-                    img = img.scaled(new_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    self.signals.preview_loaded.emit(path, QPixmap.fromImage(img))
+                    new_size = self._calculate_aspect_ratio(img.size(), preview_size)
+                    with span("scale.preview"):
+                        img = img.scaled(new_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                    with span("io.disk_cache_put"):
+                        self.disk_cache.put(cache_key, img)
+                    self._deliver_preview(path, img, preview_size)
                     return # Sai da função, trabalho feito
 
             # SE FOR JPG/PNG (ou se o RAW falhou): Usa o método padrão rápido do Qt
             reader = QImageReader(path)
             orig_size = reader.size()
-            scaled_size = self._calculate_aspect_ratio(orig_size, self.preview_size)
+            scaled_size = self._calculate_aspect_ratio(orig_size, preview_size)
             reader.setScaledSize(scaled_size)
             
             # Auto-rotação para JPGs
             reader.setAutoTransform(True)
 
-            img_data = reader.read()
+            # Leitura do disco e decodificação acontecem juntas dentro do QImageReader
+            with span("decode.jpeg"):
+                img_data = reader.read()
             if not img_data.isNull():
-                self.signals.preview_loaded.emit(path, QPixmap.fromImage(img_data))
+                with span("io.disk_cache_put"):
+                    self.disk_cache.put(cache_key, img_data)
+                self._deliver_preview(path, img_data, preview_size)
                 
         except Exception as e:
             print(f"Erro preview {path}: {e}")
@@ -165,27 +570,60 @@ class ImageLoaderWorker(QThread):
     def _load_thumbnail(self, path):
         """Carrega a miniatura para a fita (Max 160px)."""
         try:
+            cache_key = self.disk_cache.make_key(path, self.thumb_size, "thumb", self.file_stats.get(path))
+            with span("io.disk_cache_get"):
+                cached = self.disk_cache.get(cache_key)
+            if cached is not None:
+                self._deliver_thumbnail(path, cached)
+                return
+
             img = None
-            # SE FOR RAW
-            if path.lower().endswith(('.arw', '.cr2', '.nef', '.dng', '.orf')):
-                img = self._extract_raw_preview(path)
+            # SE FOR RAW: reaproveita o preview já decodificado ou usa o menor JPEG embutido
+            if self._is_raw(path):
+                img = self._peek_raw_source(path)
+                if img is None:
+                    img = self._load_raw_thumbnail(path)
+                if img is None:
+                    img = self._get_raw_source(path)
                 
                 if img and not img.isNull():
                     new_size = self._calculate_aspect_ratio(img.size(), self.thumb_size)
                     # Usa FastTransformation para thumbnails (ganha performance)
-                    img = img.scaled(new_size, Qt.KeepAspectRatio, Qt.FastTransformation)
-                    self.signals.thumbnail_loaded.emit(path, QPixmap.fromImage(img))
+                    with span("scale.thumb"):
+                        img = img.scaled(new_size, Qt.KeepAspectRatio, Qt.FastTransformation)
+                    with span("io.disk_cache_put"):
+                        self.disk_cache.put(cache_key, img)
+                    self._deliver_thumbnail(path, img)
+                    return
+
+            # SE FOR JPG: tenta a thumbnail do EXIF (IFD1), que só exige ler o cabeçalho
+            if path.lower().endswith(JPEG_EXTENSIONS):
+                with span("decode.exif_thumb"):
+                    img = load_exif_thumbnail(path)
+                # Aceita se tiver pelo menos ~3/4 do tamanho da fita (câmeras gravam 160x120)
+                if img is not None and (img.width() >= self.thumb_size.width() * 0.75
+                                        or img.height() >= self.thumb_size.height() * 0.75):
+                    if img.width() > self.thumb_size.width() or img.height() > self.thumb_size.height():
+                        new_size = self._calculate_aspect_ratio(img.size(), self.thumb_size)
+                        with span("scale.thumb"):
+                            img = img.scaled(new_size, Qt.KeepAspectRatio, Qt.FastTransformation)
+                    self._deliver_thumbnail(path, img)
                     return
 
-            # SE FOR JPG/PNG
+            # SE FOR JPG/PNG (ou o EXIF não tinha thumbnail): decodificação reduzida
             reader = QImageReader(path)
             orig_size = reader.size()
             scaled_size = self._calculate_aspect_ratio(orig_size, self.thumb_size)
             reader.setScaledSize(scaled_size)
+            # Mesma orientação da thumbnail do EXIF
+            reader.setAutoTransform(True)
             
-            img_data = reader.read()
+            with span("decode.jpeg"):
+                img_data = reader.read()
             if not img_data.isNull():
-                self.signals.thumbnail_loaded.emit(path, QPixmap.fromImage(img_data))
+                with span("io.disk_cache_put"):
+                    self.disk_cache.put(cache_key, img_data)
+                self._deliver_thumbnail(path, img_data)
         except Exception:
             pass
 
@@ -197,11 +635,34 @@ class ImageLoaderWorker(QThread):
     
     def get_full_resolution_image(self, path):
         """Método síncrono para buscar a imagem em resolução máxima (para Zoom)."""
+        img = self._load_full_image(path)
+        return QPixmap.fromImage(img) if img is not None else None
+
+    def get_full_resolution_size(self, path):
+        """
+        Dimensões da imagem em resolução máxima lendo só o cabeçalho
+        (para o zoom abrir já na escala certa antes da decodificação).
+        """
+        if self._is_raw(path):
+            jpegs = find_embedded_jpegs(path)
+            if jpegs:
+                return QSize(jpegs[-1].width, jpegs[-1].height)
+            return QSize()
+
+        reader = QImageReader(path)
+        size = reader.size()
+        # O autoTransform gira a imagem; o cabeçalho informa o tamanho antes de girar
+        if reader.transformation() & QImageIOHandler.TransformationRotate90:
+            size = size.transposed()
+        return size
+
+    def _load_full_image(self, path):
+        """Decodifica em resolução máxima. Retorna QImage ou None."""
         try:
             img = None
             # 1. Tenta RAW
-            if path.lower().endswith(('.arw', '.cr2', '.nef', '.dng', '.orf')):
-                img = self._extract_raw_preview(path)
+            if self._is_raw(path):
+                img = self._get_raw_source(path)
                 # Nota: Não redimensionamos aqui!
             
             # 2. Tenta JPG/PNG se não for RAW ou se RAW falhou
@@ -209,12 +670,13 @@ class ImageLoaderWorker(QThread):
                 reader = QImageReader(path)
                 reader.setAutoTransform(True)
                 # Lê direto (sem setScaledSize)
-                img_data = reader.read()
+                with span("decode.full"):
+                    img_data = reader.read()
                 if not img_data.isNull():
                     img = img_data
 
             if img and not img.isNull():
-                return QPixmap.fromImage(img)
+                return img
             return None
 
         except Exception as e:
@@ -1,13 +1,140 @@
-from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QFrame, QPushButton
-from PySide6.QtCore import Qt, QRectF, Signal, QObject
-from PySide6.QtGui import QPixmap, QPainter, QWheelEvent, QCursor
+import math
+from PySide6.QtWidgets import (QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QGraphicsItem,
+                               QStyleOptionGraphicsItem, QFrame, QPushButton)
+from PySide6.QtCore import Qt, QRectF, QSizeF, Signal, QObject
+from PySide6.QtGui import QPixmap, QImage, QPainter, QWheelEvent, QCursor
+from image_cache import CacheTier
+
+TILE_SIZE = 512                       # Lado do tile em pixels do nível
+TILE_BUDGET = 96 * 1024 * 1024        # Teto dos tiles quando não há ImageCache (camada "tiles")
 
 class ZoomablePreviewSignals(QObject):
     """Sinais para comunicar as mudanças de tamanho do viewport."""
     max_size_changed = Signal(QRectF) # Usaremos QRectF inicialmente, mas ajustaremos no CullingApp.
 
+class TiledImageItem(QGraphicsItem):
+    """
+    Imagem em resolução máxima desenhada em pirâmide de tiles. O nível 0 é a
+    imagem original, o nível k é reduzida 2^k vezes; cada nível é cortado em
+    tiles de TILE_SIZE. Só os tiles visíveis no nível adequado ao zoom atual
+    são gerados (sob demanda, no paint), e ficam num LRU limitado por bytes.
+    Enquanto a imagem original não chega, pinta o preview esticado.
+    """
+
+    def __init__(self, parent=None, tiles=None):
+        super().__init__(parent)
+        self.full_size = QSizeF()
+        self.placeholder = None # QPixmap (preview) esticado até full_size
+        self.source = None      # QImage em resolução máxima
+        self.max_level = 0
+        self.tiles = tiles if tiles is not None else CacheTier("tiles", TILE_BUDGET)
+        # Precisamos do exposedRect para pintar só o que aparece
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+    def set_content(self, full_size, placeholder=None, source=None):
+        self.prepareGeometryChange()
+        self.full_size = QSizeF(full_size)
+        self.placeholder = placeholder
+        self.source = None
+        self.tiles.clear()
+        if source is not None:
+            self.set_source(source)
+        self.update()
+
+    def set_source(self, image):
+        """Chegou a imagem original: troca o placeholder pelos tiles."""
+        if image is None or image.isNull():
+            return
+        if self.full_size.isEmpty():
+            self.prepareGeometryChange()
+            self.full_size = QSizeF(image.size())
+        self.source = image
+        self.tiles.clear()
+        # Último nível: a imagem inteira cabe em um tile
+        longest = max(image.width(), image.height())
+        self.max_level = max(0, math.ceil(math.log2(longest / TILE_SIZE))) if longest > TILE_SIZE else 0
+        self.update()
+
+    def release(self):
+        self.set_content(QSizeF())
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.full_size.width(), self.full_size.height())
+
+    def _level_for(self, lod):
+        """Nível mais reduzido que ainda tem pelo menos 1 pixel de imagem por pixel de tela."""
+        if lod <= 0:
+            return self.max_level
+        level = int(math.floor(math.log2(1.0 / lod))) if lod < 1 else 0
+        return max(0, min(level, self.max_level))
+
+    def _tile(self, level, tx, ty):
+        key = (level, tx, ty)
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            return pixmap
+
+        # Região do tile em coordenadas da imagem original
+        factor = 1 << level
+        src_w, src_h = self.source.width(), self.source.height()
+        sx, sy = tx * TILE_SIZE * factor, ty * TILE_SIZE * factor
+        sw = min(TILE_SIZE * factor, src_w - sx)
+        sh = min(TILE_SIZE * factor, src_h - sy)
+        tw = max(1, math.ceil(sw / factor))
+        th = max(1, math.ceil(sh / factor))
+
+        if level == 0:
+            tile = self.source.copy(sx, sy, sw, sh)
+        else:
+            # Desenha a região reduzida direto no tile, sem copiar o recorte inteiro
+            tile = QImage(tw, th, QImage.Format_ARGB32_Premultiplied)
+            tile.fill(Qt.transparent)
+            p = QPainter(tile)
+            p.setRenderHint(QPainter.SmoothPixmapTransform, True)
+            p.drawImage(QRectF(0, 0, tw, th), self.source, QRectF(sx, sy, sw, sh))
+            p.end()
+
+        pixmap = QPixmap.fromImage(tile)
+        self.tiles.put(key, pixmap)
+        return pixmap
+
+    def paint(self, painter, option, widget=None):
+        bounds = self.boundingRect()
+        if bounds.isEmpty():
+            return
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
+
+        if self.source is None:
+            if self.placeholder is not None and not self.placeholder.isNull():
+                painter.drawPixmap(bounds, self.placeholder, QRectF(self.placeholder.rect()))
+            return
+
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = self._level_for(lod)
+        factor = 1 << level
+        span = TILE_SIZE * factor # Lado do tile em coordenadas da imagem original
+
+        # Escala entre a cena (full_size) e a imagem original (normalmente 1.0)
+        sx = bounds.width() / self.source.width()
+        sy = bounds.height() / self.source.height()
+
+        exposed = option.exposedRect.intersected(bounds)
+        if exposed.isEmpty():
+            return
+        first_x = max(0, int(exposed.left() / sx) // span)
+        last_x = min((self.source.width() - 1) // span, int(exposed.right() / sx) // span)
+        first_y = max(0, int(exposed.top() / sy) // span)
+        last_y = min((self.source.height() - 1) // span, int(exposed.bottom() / sy) // span)
+
+        for ty in range(first_y, last_y + 1):
+            for tx in range(first_x, last_x + 1):
+                tile = self._tile(level, tx, ty)
+                x, y = tx * span, ty * span
+                target = QRectF(x * sx, y * sy, tile.width() * factor * sx, tile.height() * factor * sy)
+                painter.drawPixmap(target, tile, QRectF(tile.rect()))
+
 class ZoomablePreview(QGraphicsView):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, tile_cache=None):
         super().__init__(parent)
         self.signals = ZoomablePreviewSignals()
         self.scene = QGraphicsScene(self)
@@ -27,7 +154,13 @@ class ZoomablePreview(QGraphicsView):
         self.setRenderHint(QPainter.SmoothPixmapTransform, True)
         
         self.pixmap_item = QGraphicsPixmapItem()
+        self.pixmap_item.setTransformationMode(Qt.SmoothTransformation)
         self.scene.addItem(self.pixmap_item)
+
+        # Zoom: pirâmide de tiles (só existe conteúdo enquanto o zoom está ativo)
+        self.tiled_item = TiledImageItem(tiles=tile_cache)
+        self.tiled_item.hide()
+        self.scene.addItem(self.tiled_item)
         self.current_pixmap = None
         self._is_zoomed = False
 
@@ -77,6 +210,7 @@ class ZoomablePreview(QGraphicsView):
         self.current_pixmap = pixmap
         self._is_zoomed = False
         self.resetTransform()
+        self._release_tiles()
         self.pixmap_item.setPixmap(pixmap)
         rect = QRectF(pixmap.rect())
         self.scene.setSceneRect(rect)
@@ -88,6 +222,7 @@ class ZoomablePreview(QGraphicsView):
         self.btn_minus.hide()
 
     def clear(self):
+        self._release_tiles()
         self.pixmap_item.setPixmap(QPixmap())
         self.current_pixmap = None
         self.btn_plus.hide()
@@ -118,24 +253,51 @@ class ZoomablePreview(QGraphicsView):
         self.btn_plus.move(x_pos, y_pos_plus)
         self.btn_minus.move(x_pos, y_pos_minus)
 
-    def start_zoom_mode(self, full_res_pixmap):
+    def start_zoom_mode(self, placeholder, full_size=None, full_image=None):
+        """
+        Entra no zoom 1:1 com a pirâmide de tiles. Sem 'full_image', o
+        'placeholder' (preview) aparece esticado até 'full_size' e é trocado
+        pelos tiles em set_zoom_image, sem mexer na posição da visão.
+        """
+        if full_size is None or full_size.isEmpty():
+            if full_image is not None:
+                full_size = full_image.size()
+            elif placeholder is not None:
+                full_size = placeholder.size()
+            else:
+                return
+
         self._is_zoomed = True
         self.resetTransform()
-        if full_res_pixmap:
-            self.pixmap_item.setPixmap(full_res_pixmap)
-            self.scene.setSceneRect(QRectF(full_res_pixmap.rect()))
-        
+        self.tiled_item.set_content(full_size, placeholder, full_image)
+        self.scene.setSceneRect(self.tiled_item.boundingRect())
+        self.pixmap_item.hide()
+        self.tiled_item.show()
+
         self.setDragMode(QGraphicsView.ScrollHandDrag)
-        self.centerOn(self.pixmap_item)
+        self.centerOn(self.tiled_item)
         
         # MOSTRAR OS BOTÕES
         self.btn_plus.show()
         self.btn_minus.show()
 
+    def set_zoom_image(self, full_image):
+        """Chegou a resolução máxima: os tiles substituem o preview esticado."""
+        if not self._is_zoomed or full_image is None or full_image.isNull():
+            return
+        self.tiled_item.set_source(full_image)
+
+    def _release_tiles(self):
+        """Solta a imagem original e os tiles (podem ser centenas de MB)."""
+        self.tiled_item.hide()
+        self.tiled_item.release()
+        self.pixmap_item.show()
+
     def stop_zoom_mode(self):
         if not self._is_zoomed: return
         self._is_zoomed = False
         self.resetTransform()
+        self._release_tiles()
         if self.current_pixmap:
             self.pixmap_item.setPixmap(self.current_pixmap)
             self.scene.setSceneRect(QRectF(self.current_pixmap.rect()))
@@ -0,0 +1,86 @@
+import time
+from collections import deque
+
+class NavigationPrefetcher:
+    """
+    Observa as chamadas de update_position e decide quais previews carregar
+    antes do usuário chegar nelas: mais fotos na direção em que ele anda
+    (quanto mais rápido, mais longe), uma ou duas para trás, sempre dentro
+    de um orçamento de memória.
+    """
+
+    def __init__(self, ahead=3, behind=2, budget_bytes=256 * 1024 * 1024):
+        self.ahead = ahead               # Mínimo de previews à frente
+        self.behind = behind             # Previews para trás quando o usuário está parado/lento
+        self.max_ahead = 24              # Teto absoluto, mesmo com orçamento sobrando
+        self.lookahead_seconds = 0.6     # Quanto "tempo de navegação" queremos ter pronto
+        self.budget_bytes = budget_bytes
+
+        self.history = deque(maxlen=8)   # [(timestamp, índice)]
+        self.history_window = 1.5        # Segundos considerados para direção/velocidade
+
+    def reset(self):
+        self.history.clear()
+
+    def record(self, index, timestamp=None):
+        """Registra uma mudança de posição (chamado a cada update_position)."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self.history and self.history[-1][1] == index:
+            return
+        self.history.append((timestamp, index))
+
+    def _recent(self):
+        if not self.history:
+            return []
+        now = self.history[-1][0]
+        return [(t, i) for t, i in self.history if now - t <= self.history_window]
+
+    def direction(self):
+        """+1 para frente, -1 para trás. Sem histórico, assume para frente."""
+        recent = self._recent()
+        if len(recent) < 2:
+            return 1
+        delta = recent[-1][1] - recent[0][1]
+        if delta == 0:
+            # Vai-e-volta: vale o último passo
+            delta = recent[-1][1] - recent[-2][1]
+        return -1 if delta < 0 else 1
+
+    def velocity(self):
+        """Fotos por segundo na janela recente."""
+        recent = self._recent()
+        if len(recent) < 2:
+            return 0.0
+        elapsed = recent[-1][0] - recent[0][0]
+        if elapsed <= 0:
+            return 0.0
+        steps = sum(abs(b[1] - a[1]) for a, b in zip(recent, recent[1:]))
+        return steps / elapsed
+
+    def plan(self, index, total, preview_bytes):
+        """
+        Retorna os índices a pré-carregar, em ordem de prioridade
+        (o índice atual não entra; ele é carregado à parte).
+        """
+        speed = self.velocity()
+        step = self.direction()
+
+        ahead = max(self.ahead, int(round(speed * self.lookahead_seconds)))
+        ahead = min(ahead, self.max_ahead)
+        # Andando rápido, olhar para trás é desperdício: fica só uma
+        behind = min(self.behind, 1) if speed > 4 else self.behind
+
+        # Orçamento de memória: quantos previews cabem
+        if preview_bytes > 0:
+            max_items = max(1, self.budget_bytes // preview_bytes)
+            if ahead + behind > max_items:
+                behind = min(behind, max_items // 4)
+                ahead = max_items - behind
+
+        forward = [index + step * d for d in range(1, ahead + 1)]
+        backward = [index - step * d for d in range(1, behind + 1)]
+
+        # Intercala: as duas primeiras à frente, a primeira atrás, e segue
+        order = forward[:2] + backward[:1] + forward[2:] + backward[1:]
+        return [i for i in order if 0 <= i < total]
@@ -0,0 +1,153 @@
+import os
+import time
+import sqlite3
+from PySide6.QtCore import QThread, QMutex, QWaitCondition, QStandardPaths
+
+def _split(path):
+    """(pasta normalizada, nome do arquivo): a pasta é a chave da carga em lote."""
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.normcase(folder), name
+
+def wait_coalescing(condition, mutex, deadline, keep_waiting):
+    """
+    Chamado com o mutex travado: espera até 'deadline' (time.monotonic) para
+    juntar mais mudanças no mesmo lote. Acordar no meio (outra tecla) não
+    encerra a espera; só o prazo ou keep_waiting() ficar False.
+    """
+    while keep_waiting():
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            break
+        condition.wait(mutex, remaining_ms)
+
+class RatingsStore(QThread):
+    """
+    Notas gravadas em SQLite (modo WAL), para não perder a seleção num crash.
+    set_rating só anota a mudança na memória; esta thread junta as mudanças
+    (a mesma foto trocando de nota várias vezes vira uma escrita) e grava
+    tudo numa transação. A leitura da pasta inteira é uma consulta indexada.
+    """
+
+    def __init__(self, db_path=None, coalesce_ms=300):
+        super().__init__()
+        if db_path is None:
+            base = QStandardPaths.writableLocation(QStandardPaths.GenericDataLocation)
+            db_path = os.path.join(base, "LeonardoSoft", "SelecionadorFotos", "notas.sqlite3")
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.coalesce_ms = coalesce_ms
+
+        self._pending = {} # {(pasta, nome): nota} ainda não gravadas
+        self._pending_since = 0.0 # Instante da primeira mudança do lote (conta o prazo de juntar)
+        self._writing = {} # Lote sendo gravado agora (continua visível para leitura)
+        self._flush_requested = False
+        self.running = True
+        self.mutex = QMutex()
+        self.condition = QWaitCondition()
+        self.flushed = QWaitCondition()
+
+        # Conexão de leitura, usada só pela thread da interface
+        self._reader = self._connect()
+        self._reader.execute(
+            "CREATE TABLE IF NOT EXISTS ratings ("
+            " folder TEXT NOT NULL, name TEXT NOT NULL, rating INTEGER NOT NULL,"
+            " PRIMARY KEY (folder, name)) WITHOUT ROWID"
+        )
+        self._reader.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL") # Em WAL, só perde a última transação se o SO cair
+        return conn
+
+    # --- API (thread da interface) ---
+
+    def set_rating(self, path, rating):
+        """Não toca no disco: só enfileira para o writer."""
+        self.mutex.lock()
+        if not self._pending:
+            # Só a primeira mudança acorda o writer; as seguintes entram no mesmo lote
+            self._pending_since = time.monotonic()
+            self.condition.wakeOne()
+        self._pending[_split(path)] = rating
+        self.mutex.unlock()
+
+    def load_folder(self, folder):
+        """
+        Todas as notas de uma pasta: {caminho: nota}, já com as mudanças não
+        gravadas. Nota 0 = apagada aqui (marca que impede reimportar do XMP).
+        """
+        key = os.path.normcase(os.path.abspath(folder))
+        rows = self._reader.execute(
+            "SELECT name, rating FROM ratings WHERE folder = ?", (key,)
+        ).fetchall()
+        # Concatenação direta: os.path.join em 50 mil nomes custa mais que a consulta
+        prefix = os.path.join(folder, "")
+        ratings = {prefix + name: rating for name, rating in rows}
+
+        self.mutex.lock()
+        unsaved = list(self._writing.items()) + list(self._pending.items())
+        self.mutex.unlock()
+        for (pending_folder, name), rating in unsaved:
+            if pending_folder != key:
+                continue
+            ratings[prefix + name] = max(rating, 0)
+        return ratings
+
+    def flush(self):
+        """Bloqueia até tudo que foi enfileirado estar no disco."""
+        if not self.isRunning():
+            return
+        self.mutex.lock()
+        while self._pending or self._writing:
+            self._flush_requested = True # Grava sem esperar o prazo de juntar
+            self.condition.wakeOne()
+            self.flushed.wait(self.mutex)
+        self.mutex.unlock()
+
+    def close(self):
+        """Grava o que falta e encerra a thread (chamado ao fechar a janela)."""
+        self.mutex.lock()
+        self.running = False
+        self.condition.wakeOne()
+        self.mutex.unlock()
+        self.wait()
+        self._reader.close()
+
+    # --- WRITER ---
+
+    def run(self):
+        conn = self._connect()
+        while True:
+            self.mutex.lock()
+            while self.running and not self._pending:
+                self.condition.wait(self.mutex)
+            # Junta a rajada de teclas numa transação só: coalesce_ms contados da primeira
+            wait_coalescing(self.condition, self.mutex, self._pending_since + self.coalesce_ms / 1000,
+                            lambda: self.running and not self._flush_requested)
+            self._flush_requested = False
+            self._writing, self._pending = self._pending, {}
+            stop = not self.running
+            self.mutex.unlock()
+
+            if self._writing:
+                self._write(conn, self._writing)
+
+            self.mutex.lock()
+            self._writing = {}
+            self.flushed.wakeAll()
+            self.mutex.unlock()
+
+            if stop and not self._pending:
+                break
+        conn.close()
+
+    def _write(self, conn, batch):
+        # Nota apagada continua como linha com 0: sem ela, o XMP do arquivo voltaria na próxima abertura
+        rows = [(folder, name, max(rating, 0)) for (folder, name), rating in batch.items()]
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO ratings VALUES (?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar notas: {e}")
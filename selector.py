@@ -1,58 +1,82 @@
-from PySide6.QtGui import QPainter, QBrush, QColor, QFont
-from PySide6.QtCore import Qt, QRect
-
 class ImageSelector:
-    def __init__(self):
+    def __init__(self, store=None):
         # Dicionário privado para guardar as notas {caminho: nota}
         self._ratings = {}
+        # Índice inverso {nota: conjunto de caminhos}: filtros e contagens sem varrer tudo
+        self._by_rating = {rating: set() for rating in range(1, 6)}
+        # Fotos cuja nota foi apagada aqui: a importação XMP não traz a nota de volta
+        self._cleared = set()
+        # Persistência opcional (RatingsStore): grava em segundo plano
+        self.store = store
 
     def set_rating(self, path, rating):
         """Define uma nota. Se rating for 0, remove da lista."""
+        old = self._ratings.get(path, 0)
+        if old:
+            self._by_rating[old].discard(path)
         if rating > 0:
             self._ratings[path] = rating
+            self._by_rating[rating].add(path)
+            self._cleared.discard(path)
         else:
             if path in self._ratings:
                 del self._ratings[path]
+            self._cleared.add(path)
+        if self.store is not None:
+            self.store.set_rating(path, rating)
+
+    def load_folder(self, folder):
+        """Troca as notas em memória pelas gravadas para esta pasta."""
+        saved = self.store.load_folder(folder) if self.store is not None else {}
+        self._ratings = {path: rating for path, rating in saved.items() if rating > 0}
+        self._cleared = {path for path, rating in saved.items() if rating <= 0}
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        for paths in self._by_rating.values():
+            paths.clear()
+        for path, rating in self._ratings.items():
+            self._by_rating[rating].add(path)
+
+    def import_ratings(self, ratings):
+        """
+        Notas vindas de fora (XMP). Só preenche fotos ainda sem nota: a
+        escolha feita aqui sempre vence, inclusive apagar a nota. Retorna os
+        caminhos alterados.
+        """
+        changed = []
+        for path, rating in ratings.items():
+            if rating > 0 and path not in self._ratings and path not in self._cleared:
+                self.set_rating(path, rating)
+                changed.append(path)
+        return changed
+
+    def close(self):
+        """Garante que as notas pendentes cheguem ao disco."""
+        if self.store is not None:
+            self.store.close()
 
     def get_rating(self, path):
         """Retorna a nota atual de um arquivo (ou 0 se não tiver)."""
         return self._ratings.get(path, 0)
 
+    def paths_with_rating(self, rating):
+        """Caminhos com esta nota (1 a 5). Não alterar o conjunto retornado."""
+        return self._by_rating.get(rating, set())
+
+    def count(self, rating):
+        return len(self._by_rating.get(rating, ()))
+
+    def has_ratings(self):
+        """Existe alguma foto com nota? (O(1), sem varrer as notas)"""
+        return any(self._by_rating.values())
+
     def get_selected_items(self):
         """Retorna o dicionário completo para exportação."""
         return self._ratings
 
     def clear(self):
+        """Limpa só a memória (as notas gravadas continuam no disco)."""
         self._ratings.clear()
-
-    def apply_overlay(self, pixmap, rating):
-        """
-        Recebe um QPixmap limpo e desenha o selo sobre ele.
-        Retorna um NOVO QPixmap modificado.
-        """
-        if rating == 0:
-            return pixmap
-        
-        resultado = pixmap.copy()
-        painter = QPainter(resultado)
-        painter.setRenderHint(QPainter.Antialiasing)
-
-        # Configuração do visual do selo
-        tamanho_selo = 30
-        margem = 5
-        x = resultado.width() - tamanho_selo - margem
-        y = margem
-
-        # Desenha Círculo Amarelo
-        painter.setBrush(QBrush(QColor("#f1c40f")))
-        painter.setPen(Qt.NoPen)
-        painter.drawEllipse(x, y, tamanho_selo, tamanho_selo)
-
-        # Desenha Número
-        painter.setPen(QColor("#000000"))
-        font = QFont("Arial", 12, QFont.Bold)
-        painter.setFont(font)
-        painter.drawText(QRect(x, y, tamanho_selo, tamanho_selo), Qt.AlignCenter, str(rating))
-
-        painter.end()
-        return resultado
\ No newline at end of file
+        self._cleared.clear()
+        self._rebuild_index()
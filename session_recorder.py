@@ -0,0 +1,85 @@
+import os
+import json
+import time
+from PySide6.QtCore import Qt, QEvent
+from PySide6.QtGui import QKeyEvent
+
+# Caminho do arquivo de gravação; sem a variável, nada é gravado
+RECORD_ENV = "PASSA_RECORD_SESSION"
+SESSION_VERSION = 1
+
+class SessionRecorder:
+    """
+    Grava uma sessão de seleção (pasta aberta + teclas do eventFilter, com o
+    instante de cada uma) em JSON Lines, para reproduzir depois sem janela
+    com benchmarks/replay_session.py e medir a latência que a pessoa sente.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._start = time.perf_counter()
+        # Uma linha por evento, com buffer de linha: um crash perde no máximo a última tecla
+        self._file = open(path, "w", encoding="utf-8", buffering=1)
+        self._write({"type": "session", "version": SESSION_VERSION,
+                     "started": time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+    @classmethod
+    def from_env(cls):
+        path = os.environ.get(RECORD_ENV)
+        if not path:
+            return None
+        try:
+            return cls(path)
+        except OSError as e:
+            print(f"Não foi possível gravar a sessão em {path}: {e}")
+            return None
+
+    def _write(self, record):
+        if self._file is not None:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _elapsed(self):
+        return round(time.perf_counter() - self._start, 4)
+
+    def record_folder(self, folder, window_size=None):
+        """Pasta aberta; o tamanho da janela define o tamanho dos previews no replay."""
+        record = {"t": self._elapsed(), "type": "folder", "path": folder}
+        if window_size is not None:
+            record["window"] = [window_size.width(), window_size.height()]
+        self._write(record)
+
+    def record_key(self, event, target):
+        """target: 'filmstrip' ou 'preview' (onde a tecla foi entregue)."""
+        self._write({
+            "t": self._elapsed(), "type": "key", "target": target,
+            "key": event.key(), "modifiers": event.modifiers().value,
+            "text": event.text(), "auto_repeat": event.isAutoRepeat(),
+        })
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def load_session(path):
+    """Lê uma gravação: (cabeçalho, lista de eventos em ordem)."""
+    header, events = {}, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break # Última linha cortada por um crash
+            if record.get("type") == "session":
+                header = record
+            else:
+                events.append(record)
+    return header, events
+
+def key_event_from(record):
+    """Recria o QKeyEvent gravado."""
+    return QKeyEvent(QEvent.KeyPress, record["key"], Qt.KeyboardModifier(record["modifiers"]),
+                     record["text"], record["auto_repeat"])
@@ -4,13 +4,15 @@ from PySide6.QtWidgets import (
     QPushButton, QCheckBox, QGroupBox,
     QSpinBox, QSpacerItem, QSizePolicy, QFrame
 )
-from PySide6.QtCore import Qt, QSettings
+from PySide6.QtCore import Qt, QSettings, QThread
+from image_loader import default_worker_count
+from export_manager import default_export_workers
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Configurações")
-        self.resize(480, 350)
+        self.resize(480, 660)
 
         # Estilo Dark Mode (mesmas cores, só refinando layout/curvas/tipografia)
         self.setStyleSheet("""
@@ -191,8 +193,17 @@ class SettingsDialog(QDialog):
 
         # 1. Correção Automática
         self.chk_full_auto = QCheckBox("Correção e ajustes automáticos de imagem")
+        self.chk_full_auto.toggled.connect(self.on_full_auto_toggled)
         main_layout.addWidget(self.chk_full_auto)
 
+        # 1.1 Motor da correção (NumPy interno ou ImageMagick externo)
+        self.chk_full_auto_magick = QCheckBox("Usar ImageMagick na correção automática (mais lento)")
+        self.chk_full_auto_magick.setEnabled(False)
+        row_magick = QHBoxLayout()
+        row_magick.addSpacing(20)
+        row_magick.addWidget(self.chk_full_auto_magick)
+        main_layout.addLayout(row_magick)
+
         # 2. Redimensionar
         row_resize = QHBoxLayout()
         self.chk_resize = QCheckBox("Redimensionar o lado maior do arquivo:")
@@ -233,6 +244,99 @@ class SettingsDialog(QDialog):
         line_3.setFrameShadow(QFrame.Sunken)
         main_layout.addWidget(line_3)
 
+        # --- SEÇÃO 3: DESEMPENHO ---
+
+        # 1. Threads de decodificação (pool do carregador de imagens)
+        row_workers = QHBoxLayout()
+        lbl_workers = QLabel("Threads para carregar as fotos:")
+
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setRange(1, max(1, QThread.idealThreadCount()))
+        self.spin_workers.setValue(default_worker_count())
+
+        row_workers.addWidget(lbl_workers)
+        row_workers.addStretch()
+        row_workers.addWidget(self.spin_workers)
+
+        main_layout.addLayout(row_workers)
+
+        # 2. Prefetch de previews
+        row_prefetch = QHBoxLayout()
+        lbl_prefetch = QLabel("Previews pré-carregados à frente:")
+
+        self.spin_prefetch = QSpinBox()
+        self.spin_prefetch.setRange(1, 12)
+        self.spin_prefetch.setValue(3)
+
+        row_prefetch.addWidget(lbl_prefetch)
+        row_prefetch.addStretch()
+        row_prefetch.addWidget(self.spin_prefetch)
+
+        main_layout.addLayout(row_prefetch)
+
+        # 3. Orçamento de RAM do cache de imagens
+        row_cache = QHBoxLayout()
+        lbl_cache = QLabel("Memória para cache de imagens:")
+
+        self.spin_cache = QSpinBox()
+        self.spin_cache.setRange(64, 16384)
+        self.spin_cache.setSingleStep(64)
+        self.spin_cache.setSuffix(" MB")
+        self.spin_cache.setValue(512)
+
+        row_cache.addWidget(lbl_cache)
+        row_cache.addStretch()
+        row_cache.addWidget(self.spin_cache)
+
+        main_layout.addLayout(row_cache)
+
+        # 4. Exportações simultâneas
+        row_export = QHBoxLayout()
+        lbl_export = QLabel("Arquivos exportados em paralelo:")
+
+        self.spin_export_workers = QSpinBox()
+        self.spin_export_workers.setRange(1, max(1, QThread.idealThreadCount()))
+        self.spin_export_workers.setValue(default_export_workers())
+
+        row_export.addWidget(lbl_export)
+        row_export.addStretch()
+        row_export.addWidget(self.spin_export_workers)
+
+        main_layout.addLayout(row_export)
+
+        # 5. Hardlink na exportação sem edição
+        self.chk_hardlink = QCheckBox("Sem edição no mesmo disco: criar link em vez de copiar")
+        self.chk_hardlink.setToolTip(
+            "A foto exportada passa a ser o mesmo arquivo do original (não ocupa espaço).\n"
+            "Editar uma das duas altera a outra."
+        )
+        main_layout.addWidget(self.chk_hardlink)
+
+        # 6. Diagnóstico: tempo de cada etapa no log + arquivo de trace
+        self.chk_trace = QCheckBox("Medir o tempo de cada etapa (diagnóstico)")
+        self.chk_trace.setToolTip(
+            "Mostra no log as médias de leitura, decodificação, redimensionamento e exportação.\n"
+            "Ao fechar, grava um trace para abrir no chrome://tracing ou no Perfetto."
+        )
+        main_layout.addWidget(self.chk_trace)
+
+        line_4 = QFrame()
+        line_4.setObjectName("line")
+        line_4.setFrameShape(QFrame.HLine)
+        line_4.setFrameShadow(QFrame.Sunken)
+        main_layout.addWidget(line_4)
+
+        # --- SEÇÃO 4: NOTAS XMP (Lightroom / câmera) ---
+        self.chk_xmp_import = QCheckBox("Importar notas XMP ao abrir a pasta")
+        self.chk_xmp_import.setToolTip(
+            "Lê as estrelas gravadas pela câmera ou pelo Lightroom (sidecar .xmp ou dentro do arquivo).\n"
+            "Só preenche fotos que ainda não têm nota aqui."
+        )
+        main_layout.addWidget(self.chk_xmp_import)
+
+        self.chk_xmp_sync = QCheckBox("Gravar as notas nos sidecars XMP")
+        main_layout.addWidget(self.chk_xmp_sync)
+
         # Espaço antes dos botões
         main_layout.addStretch()
 
@@ -258,6 +362,9 @@ class SettingsDialog(QDialog):
 
     # --- LÓGICA DE INTERFACE ---
 
+    def on_full_auto_toggled(self, checked):
+        self.chk_full_auto_magick.setEnabled(checked)
+
     def on_resize_toggled(self, checked):
         self.spin_resize.setEnabled(checked)
 
@@ -274,6 +381,7 @@ class SettingsDialog(QDialog):
         # 2. Auto Correção
         is_full_auto = self.settings.value("full_auto", False, type=bool)
         self.chk_full_auto.setChecked(is_full_auto)
+        self.chk_full_auto_magick.setChecked(self.settings.value("full_auto_magick", False, type=bool))
         
         # 3. Resize
         has_resize = self.settings.value("use_resize", False, type=bool)
@@ -284,6 +392,18 @@ class SettingsDialog(QDialog):
         has_quality = self.settings.value("use_quality", False, type=bool)
         self.chk_quality.setChecked(has_quality)
         self.spin_quality.setValue(self.settings.value("quality_value", 75, type=int))
+
+        # 5. Desempenho
+        self.spin_workers.setValue(self.settings.value("decode_workers", default_worker_count(), type=int))
+        self.spin_prefetch.setValue(self.settings.value("prefetch_ahead", 3, type=int))
+        self.spin_cache.setValue(self.settings.value("cache_budget_mb", 512, type=int))
+        self.spin_export_workers.setValue(self.settings.value("export_workers", default_export_workers(), type=int))
+        self.chk_hardlink.setChecked(self.settings.value("use_hardlink", False, type=bool))
+        self.chk_trace.setChecked(self.settings.value("trace_enabled", False, type=bool))
+
+        # 6. Notas XMP
+        self.chk_xmp_import.setChecked(self.settings.value("xmp_import", True, type=bool))
+        self.chk_xmp_sync.setChecked(self.settings.value("xmp_sync", False, type=bool))
         
 
     def save_and_close(self):
@@ -292,6 +412,7 @@ class SettingsDialog(QDialog):
         
         # 2. Auto Correção
         self.settings.setValue("full_auto", self.chk_full_auto.isChecked())
+        self.settings.setValue("full_auto_magick", self.chk_full_auto_magick.isChecked())
         
         # 3. Resize
         self.settings.setValue("use_resize", self.chk_resize.isChecked())
@@ -301,4 +422,16 @@ class SettingsDialog(QDialog):
         self.settings.setValue("use_quality", self.chk_quality.isChecked())
         self.settings.setValue("quality_value", self.spin_quality.value())
 
+        # 5. Desempenho
+        self.settings.setValue("decode_workers", self.spin_workers.value())
+        self.settings.setValue("prefetch_ahead", self.spin_prefetch.value())
+        self.settings.setValue("cache_budget_mb", self.spin_cache.value())
+        self.settings.setValue("export_workers", self.spin_export_workers.value())
+        self.settings.setValue("use_hardlink", self.chk_hardlink.isChecked())
+        self.settings.setValue("trace_enabled", self.chk_trace.isChecked())
+
+        # 6. Notas XMP
+        self.settings.setValue("xmp_import", self.chk_xmp_import.isChecked())
+        self.settings.setValue("xmp_sync", self.chk_xmp_sync.isChecked())
+
         self.accept()
@@ -0,0 +1,156 @@
+"""
+Medição opcional do tempo de cada etapa do pipeline de imagens (leitura do
+disco, rawpy, decodificação, scaled, QPixmap.fromImage, entrega do sinal...).
+
+Ligada pela variável PASSA_TRACE (caminho do JSON, ou "1" para o caminho
+padrão) ou pela opção nas Configurações. Desligada, cada span custa uma
+checagem de atributo. O resultado sai no formato "Trace Event" do Chrome
+(abrir em chrome://tracing ou https://ui.perfetto.dev).
+
+Uso:
+    with span("decode.jpeg", path=path):
+        img = reader.read()
+"""
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+TRACE_ENV = "PASSA_TRACE"
+ROLLING_WINDOW = 200      # Últimas N medições de cada etapa entram na média
+MAX_EVENTS = 500_000      # Teto do trace em memória (~100 MB); depois só as médias continuam
+
+_NULL_SPAN = nullcontext()
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add_span(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+class Tracer:
+    """Coleta spans de qualquer thread; o dump e as médias são lidos pela interface."""
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._events = []
+        self._threads = {}   # {tid: nome} para nomear as linhas no visualizador
+        self._recent = {}    # {etapa: deque de durações em ms}
+        self._pending = {}   # {chave: instante} spans que começam numa thread e acabam em outra
+        self._new_spans = 0
+
+    def enable(self, path):
+        with self.lock:
+            self.path = path
+            self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    # --- COLETA ---
+
+    def span(self, name, **args):
+        """Context manager que mede o bloco (sem custo quando desligado)."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def add_span(self, name, start, end, args=None):
+        """Registra um intervalo já medido (instantes de time.perf_counter)."""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        tid = thread.ident
+        duration = end - start
+        with self.lock:
+            if tid not in self._threads:
+                self._threads[tid] = thread.name
+            if len(self._events) < MAX_EVENTS:
+                event = {
+                    "name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": os.getpid(), "tid": tid,
+                    "ts": (start - self._origin) * 1e6, "dur": duration * 1e6,
+                }
+                if args:
+                    event["args"] = args
+                self._events.append(event)
+            recent = self._recent.get(name)
+            if recent is None:
+                recent = self._recent[name] = deque(maxlen=ROLLING_WINDOW)
+            recent.append(duration * 1000)
+            self._new_spans += 1
+
+    def begin(self, key):
+        """Marca o início de algo que termina em outra thread (ex.: sinal até a interface)."""
+        if self.enabled:
+            with self.lock:
+                self._pending[key] = time.perf_counter()
+
+    def end(self, key, name, **args):
+        """Fecha o que begin(key) abriu, na thread atual. Ignora chaves desconhecidas."""
+        if not self.enabled:
+            return
+        with self.lock:
+            start = self._pending.pop(key, None)
+        if start is not None:
+            self.add_span(name, start, time.perf_counter(), args)
+
+    # --- LEITURA ---
+
+    def rolling_averages(self):
+        """{etapa: (média em ms, quantidade)} das últimas medições de cada etapa."""
+        with self.lock:
+            return {name: (sum(d) / len(d), len(d)) for name, d in self._recent.items() if d}
+
+    def take_new_count(self):
+        """Quantos spans chegaram desde a última chamada (para não repetir o log à toa)."""
+        with self.lock:
+            count, self._new_spans = self._new_spans, 0
+        return count
+
+    def summary_text(self, limit=8):
+        """As etapas que mais somam tempo, numa linha para o log."""
+        averages = self.rolling_averages()
+        top = sorted(averages.items(), key=lambda item: item[1][0] * item[1][1], reverse=True)[:limit]
+        return " | ".join(f"{name} {avg:.1f}ms" for name, (avg, _) in top)
+
+    def dump(self, path=None):
+        """Grava o trace (formato Trace Event do Chrome). Retorna o caminho ou None."""
+        path = path or self.path
+        if not path:
+            return None
+        with self.lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        meta = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                for tid, name in threads.items()]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+        return path
+
+# Instância única do processo: os módulos importam 'span' e 'tracer' daqui
+tracer = Tracer()
+span = tracer.span
+
+def trace_path_from_env():
+    """Caminho pedido em PASSA_TRACE; "" se a variável pede o caminho padrão; None se desligada."""
+    value = os.environ.get(TRACE_ENV, "").strip()
+    if not value or value == "0":
+        return None
+    return "" if value.lower() in ("1", "true", "yes", "sim") else value
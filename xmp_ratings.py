@@ -0,0 +1,201 @@
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QThread, QMutex, QWaitCondition, Signal
+from exif_reader import read_xmp_packet
+from ratings_store import wait_coalescing
+
+# xmp:Rating="3" (atributo) ou <xmp:Rating>3</xmp:Rating> (elemento)
+RATING_RE = re.compile(rb"""xmp:Rating\s*(?:=\s*["']|>)\s*(-?\d+)""")
+
+SIDECAR_TEMPLATE = """<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:xmp="http://ns.adobe.com/xap/1.0/"
+    xmp:Rating="{rating}"/>
+ </rdf:RDF>
+</x:xmpmeta>
+"""
+
+def sidecar_candidates(path):
+    """Nomes usados pelos programas: IMG_1.xmp (Lightroom/Capture One) e IMG_1.ARW.xmp (darktable)."""
+    base = os.path.splitext(path)[0]
+    return [base + ".xmp", base + ".XMP", path + ".xmp"]
+
+def find_sidecar(path):
+    for candidate in sidecar_candidates(path):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+def _explicit_rating(data):
+    """O xmp:Rating do pacote como está (0 e -1 inclusive), ou None se não houver."""
+    if not data:
+        return None
+    match = RATING_RE.search(data)
+    return int(match.group(1)) if match else None
+
+def parse_rating(data):
+    """Nota de 1 a 5 de um pacote XMP, ou None (sem nota, 0 ou rejeitada = -1)."""
+    rating = _explicit_rating(data)
+    return min(rating, 5) if rating is not None and rating > 0 else None
+
+def read_rating(path):
+    """
+    Sidecar primeiro (é onde o Lightroom grava as edições), depois o XMP do
+    próprio arquivo. Um xmp:Rating 0 no sidecar é nota apagada de propósito:
+    vence a nota embutida no arquivo.
+    """
+    sidecar = find_sidecar(path)
+    if sidecar is not None:
+        try:
+            with open(sidecar, "rb") as f:
+                rating = _explicit_rating(f.read())
+            if rating is not None:
+                return min(rating, 5) if rating > 0 else None
+        except OSError:
+            pass
+    return parse_rating(read_xmp_packet(path))
+
+class XmpImporter(QThread):
+    """
+    Lê as notas XMP de uma pasta inteira em segundo plano (várias leituras
+    de cabeçalho em paralelo) e entrega em lotes, sem travar a navegação.
+    """
+    ratings_found = Signal(object) # {caminho: nota}
+    import_finished = Signal(int)  # Total de notas encontradas
+
+    def __init__(self, paths, workers=8):
+        super().__init__()
+        self.paths = list(paths)
+        self.workers = workers
+        self.cancelled = False
+        self.batch_size = 256
+        self.batch_interval = 0.3 # Segundos máximos entre lotes
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _read(self, path):
+        if self.cancelled:
+            return path, None
+        return path, read_rating(path)
+
+    def run(self):
+        total = 0
+        batch = {}
+        last_emit = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for path, rating in pool.map(self._read, self.paths):
+                if self.cancelled:
+                    break
+                if rating is None:
+                    continue
+                batch[path] = rating
+                now = time.monotonic()
+                if len(batch) >= self.batch_size or now - last_emit >= self.batch_interval:
+                    total += len(batch)
+                    self.ratings_found.emit(batch)
+                    batch = {}
+                    last_emit = now
+
+        if batch and not self.cancelled:
+            total += len(batch)
+            self.ratings_found.emit(batch)
+        if not self.cancelled:
+            self.import_finished.emit(total)
+
+def write_sidecar(path, rating):
+    """
+    Grava a nota no sidecar (cria se não existir). Preserva o resto do XMP
+    de outros programas: só troca ou acrescenta o xmp:Rating.
+    """
+    sidecar = find_sidecar(path)
+    if sidecar is None:
+        if rating <= 0 and parse_rating(read_xmp_packet(path)) is None:
+            return True # Sem nota em lugar nenhum: nada a registrar
+        # Apagar a nota de um arquivo com nota embutida também cria o sidecar (com 0),
+        # senão a nota do arquivo volta na próxima leitura
+        sidecar = sidecar_candidates(path)[0]
+        data = SIDECAR_TEMPLATE.format(rating=rating).encode("utf-8")
+    else:
+        with open(sidecar, "rb") as f:
+            data = f.read()
+        match = RATING_RE.search(data)
+        if match:
+            data = data[:match.start(1)] + str(rating).encode() + data[match.end(1):]
+        elif b"<rdf:Description" in data:
+            attrs = f' xmp:Rating="{rating}"'.encode()
+            if b"xmlns:xmp=" not in data:
+                attrs = b' xmlns:xmp="http://ns.adobe.com/xap/1.0/"' + attrs
+            data = data.replace(b"<rdf:Description", b"<rdf:Description" + attrs, 1)
+        else:
+            print(f"Sidecar sem rdf:Description, não alterado: {sidecar}")
+            return False
+
+    # Escrita atômica: um crash nunca deixa o sidecar pela metade
+    tmp = f"{sidecar}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, sidecar)
+    return True
+
+class XmpSidecarWriter(QThread):
+    """
+    Devolve as notas para os sidecars XMP. Como no RatingsStore, as teclas
+    só enfileiram; a thread junta as mudanças e grava o lote em paralelo.
+    """
+
+    def __init__(self, workers=4, coalesce_ms=500):
+        super().__init__()
+        self.workers = workers
+        self.coalesce_ms = coalesce_ms
+        self._pending = {} # {caminho: nota}
+        self._pending_since = 0.0
+        self.running = True
+        self.mutex = QMutex()
+        self.condition = QWaitCondition()
+
+    def queue(self, path, rating):
+        self.mutex.lock()
+        if not self._pending:
+            self._pending_since = time.monotonic()
+            self.condition.wakeOne()
+        self._pending[path] = rating
+        self.mutex.unlock()
+
+    def close(self):
+        """Grava o que falta e encerra."""
+        self.mutex.lock()
+        self.running = False
+        self.condition.wakeOne()
+        self.mutex.unlock()
+        self.wait()
+
+    def _write_one(self, item):
+        path, rating = item
+        try:
+            return write_sidecar(path, rating)
+        except OSError as e:
+            print(f"Erro ao gravar XMP de {os.path.basename(path)}: {e}")
+            return False
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                self.mutex.lock()
+                while self.running and not self._pending:
+                    self.condition.wait(self.mutex)
+                wait_coalescing(self.condition, self.mutex, self._pending_since + self.coalesce_ms / 1000,
+                                lambda: self.running)
+                batch, self._pending = self._pending, {}
+                stop = not self.running
+                self.mutex.unlock()
+
+                if batch:
+                    list(pool.map(self._write_one, batch.items()))
+                if stop:
+                    break